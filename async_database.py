@@ -0,0 +1,74 @@
+# async_database.py
+# Async counterparts of the functions in database.py, for code running on the
+# bot's event loop. Every call runs on one dedicated database thread, so a slow
+# disk delays that call only, never the other handlers.
+#   raid_details = await async_database.get_active_raid_details(chat_id)
+import asyncio
+import functools
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+import database
+
+# A single thread: its connection (see database.get_connection) serves every
+# call, and SQLite allows only one writer at a time anyway.
+_executor = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="database")
+    return _executor
+
+
+async def run(func, *args, **kwargs):
+    """Runs `func(*args, **kwargs)` on the database thread and awaits its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def _make_async(func):
+    @functools.wraps(func)
+    async def call(*args, **kwargs):
+        return await run(func, *args, **kwargs)
+    return call
+
+
+async def close():
+    """Closes the database thread's connections and stops the thread."""
+    global _executor
+    if _executor is None:
+        return
+    await run(database.close_connections)
+    _executor.shutdown(wait=True)
+    _executor = None
+
+
+# One coroutine function per public function of database.py, with the same name.
+# Connection handling stays thread-bound and cache lookups never touch the
+# disk, so neither is exported.
+_NOT_WRAPPED = ("get_connection", "close_connections",
+                "cached_user_registration", "cached_active_raid_details")
+
+for _name, _func in inspect.getmembers(database, inspect.isfunction):
+    if _func.__module__ == database.__name__ and not _name.startswith("_") \
+            and _name not in _NOT_WRAPPED:
+        globals()[_name] = _make_async(_func)
+
+
+# Checked for every group message with a link: answered straight from the
+# cache in database.py when possible, without a trip to the database thread.
+
+async def is_user_registered(telegram_id):
+    registered = database.cached_user_registration(telegram_id)
+    if registered is not None:
+        return registered
+    return await run(database.is_user_registered, telegram_id)
+
+
+async def get_active_raid_details(group_id):
+    raid_details = database.cached_active_raid_details(group_id)
+    if raid_details is not database.NOT_CACHED:
+        return raid_details
+    return await run(database.get_active_raid_details, group_id)
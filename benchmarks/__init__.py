@@ -0,0 +1,3 @@
+# benchmarks
+# Offline replay fixtures and throughput benchmarks for the scraper.
+# Run the tools from the repository root, e.g. `python -m benchmarks.bench_scraper`.
@@ -0,0 +1,154 @@
+# benchmarks/bench_scraper.py
+# Measures scraper throughput against recorded fixtures served from localhost.
+#   python -m benchmarks.bench_scraper --modes graphql,dom --concurrency 1,3,5 --pages 20
+# For every mode and concurrency level it reports pages per minute, per-phase
+# latency, handles extracted (and recall against the recording) and the peak
+# RSS of the browser processes.
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+import scraper
+from browser_pool import BrowserPool
+from resource_monitor import process_tree_rss
+from benchmarks.fixture_server import FixtureServer
+from benchmarks.fixtures import FIXTURES_DIR
+
+PHASES = ("navigate", "scroll", "reveal", "extract", "fetch", "total")
+# "http" runs the browserless backend against the fixture server's TweetDetail endpoint.
+MODES = scraper.EXTRACTION_MODES + ("http",)
+# The fixture server ignores credentials, but the HTTP client requires a logged-in session.
+FIXTURE_STORAGE_STATE = {"cookies": [
+    {"name": "ct0", "value": "replay", "domain": ".x.com"},
+    {"name": "auth_token", "value": "replay", "domain": ".x.com"},
+]}
+RSS_SAMPLE_INTERVAL = 0.25
+
+
+def _percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+async def _sample_peak_rss(peak: list, stop: asyncio.Event):
+    while not stop.is_set():
+        peak[0] = max(peak[0], process_tree_rss())
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=RSS_SAMPLE_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_case(server: FixtureServer, mode: str, concurrency: int, pages: int) -> dict:
+    """Scrapes `pages` fixture URLs (cycling through them) and returns the measurements."""
+    if mode != "http":
+        os.environ["SCRAPER_EXTRACTION_MODE"] = mode
+    os.environ["X_API_BASE_URL"] = f"http://{server.host}:{server.port}"
+    tweet_ids = list(server.fixtures)
+    urls = [server.url_for(tweet_ids[i % len(tweet_ids)]) for i in range(pages)]
+
+    pool = None
+    if mode != "http":
+        pool = BrowserPool(size=1)
+        await pool.start()
+    semaphore = asyncio.Semaphore(concurrency)
+    peak_rss = [process_tree_rss()]
+    stop_sampling = asyncio.Event()
+    sampler = asyncio.create_task(_sample_peak_rss(peak_rss, stop_sampling))
+
+    async def scrape(url):
+        async with semaphore:
+            if mode == "http":
+                return await scraper.scrape_tweet_http(url, FIXTURE_STORAGE_STATE)
+            return await scraper.scrape_in_new_context(pool, url, None)
+
+    started = time.monotonic()
+    try:
+        results = await asyncio.gather(*[scrape(url) for url in urls])
+    finally:
+        elapsed = time.monotonic() - started
+        stop_sampling.set()
+        await sampler
+        if pool is not None:
+            await pool.stop()
+
+    recalls = []
+    for result in results:
+        expected = server.fixtures[scraper.extract_tweet_id(result.url)].expected_handles
+        if expected:
+            recalls.append(len(result.handles & expected) / len(expected))
+
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "pages": pages,
+        "errors": sum(1 for r in results if r.error),
+        "elapsed_s": round(elapsed, 2),
+        "pages_per_minute": round(pages / elapsed * 60, 2) if elapsed else 0.0,
+        "phases": {
+            phase: {
+                "p50": round(_percentile([r.timings[phase] for r in results if phase in r.timings], 0.5), 3),
+                "p95": round(_percentile([r.timings[phase] for r in results if phase in r.timings], 0.95), 3),
+            }
+            for phase in PHASES
+        },
+        "handles_mean": round(statistics.mean(len(r.handles) for r in results), 1) if results else 0,
+        "recall_mean": round(statistics.mean(recalls), 3) if recalls else None,
+        "peak_rss_mb": round(peak_rss[0] / 1_000_000, 1),
+    }
+
+
+def print_table(rows: list):
+    print()
+    print(f"{'mode':<8} {'conc':>4} {'pages/min':>10} {'total p50':>10} {'total p95':>10} "
+          f"{'scroll p50':>11} {'handles':>8} {'recall':>7} {'peak RSS':>10} {'errors':>6}")
+    for row in rows:
+        recall = f"{row['recall_mean']:.0%}" if row["recall_mean"] is not None else "-"
+        print(f"{row['mode']:<8} {row['concurrency']:>4} {row['pages_per_minute']:>10.1f} "
+              f"{row['phases']['total']['p50']:>9.2f}s {row['phases']['total']['p95']:>9.2f}s "
+              f"{row['phases']['scroll']['p50']:>10.2f}s {row['handles_mean']:>8} {recall:>7} "
+              f"{row['peak_rss_mb']:>7.0f} MB {row['errors']:>6}")
+
+
+async def run_benchmarks(args) -> list:
+    server = FixtureServer(args.fixtures, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+    if not server.fixtures:
+        raise SystemExit(f"No fixtures found in {args.fixtures}. Record some with benchmarks.record_fixtures.")
+    os.environ["SCRAPER_LEAN_MODE"] = "1" if args.lean else "0"
+    server.start()
+    rows = []
+    try:
+        for mode in args.modes.split(","):
+            for concurrency in (int(c) for c in args.concurrency.split(",")):
+                print(f"Running {mode} x{concurrency} over {args.pages} page(s)...")
+                rows.append(await run_case(server, mode, concurrency, args.pages))
+    finally:
+        server.stop()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scraper against replay fixtures.")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--concurrency", default="1,3")
+    parser.add_argument("--pages", type=int, default=10, help="pages scraped per run")
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--lean", type=int, default=1, help="1 to enable lean mode, 0 to disable")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    rows = asyncio.run(run_benchmarks(args))
+    print_table(rows)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+# benchmarks/fixture_server.py
+# Serves recorded fixtures on localhost with configurable latency, so scraper
+# runs can be repeated offline against exactly the same data.
+#   python -m benchmarks.fixture_server --port 8800 --latency-ms 150
+#
+# Routes:
+#   /<user>/status/<id>                      the recorded page, with X's scripts replaced
+#                                            by a small replay script (see below)
+#   /i/api/graphql/<query id>/TweetDetail    ?variables={"focalTweetId": ..., "cursor": ...}
+#                                            returns the recorded response that followed
+#                                            `cursor` (an empty page after the last one),
+#                                            or the first one without a cursor
+# The replay script fetches the first TweetDetail page on load and the next one
+# whenever the page is scrolled to the bottom, like X does. Each page's replies
+# are rendered as tweet articles and its "show more" cursors as buttons, so the
+# dom mode scrolls, reveals and extracts real markup.
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from tweet_detail import parse_tweet_detail
+from benchmarks.fixtures import FIXTURES_DIR, load_fixtures
+
+STATUS_PATH_PATTERN = re.compile(r"^/[^/]+/status/(\d+)")
+DETAIL_PATH_PATTERN = re.compile(r"^/i/api/graphql/[^/]+/TweetDetail$")
+
+EMPTY_DETAIL_PAGE = json.dumps(
+    {"data": {"threaded_conversation_with_injections_v2": {"instructions": []}}}).encode()
+
+_SCRIPT_TAG_PATTERN = re.compile(r"<script\b[^>]*>.*?</script>", re.S | re.I)
+_EXTERNAL_LINK_PATTERN = re.compile(r"<link\b[^>]*href=\"https?://[^>]*>", re.I)
+_EXTERNAL_SRC_PATTERN = re.compile(r"\b(src|srcset)=\"https?://[^\"]*\"", re.I)
+
+_REPLAY_JS = """
+<script>
+(() => {
+  const focalTweetId = %(tweet_id)s;
+  const SHOW_MORE_CURSORS = ['ShowMore', 'ShowMoreThreads', 'ShowMoreThreadsPrompt'];
+  const list = document.querySelector('main') || document.body;
+  const rendered = new Set(), offered = new Set();
+  let cursor = null, loading = false, done = false;
+  const walk = (node, tweets, cursors) => {
+    if (Array.isArray(node)) {
+      for (const item of node) walk(item, tweets, cursors);
+    } else if (node && typeof node === 'object') {
+      if (node.cursorType && node.value) cursors[node.cursorType] = node.value;
+      for (const key in node) {
+        if (key === 'quoted_status_result') continue;
+        if (key === 'tweet_results' && node[key] && node[key].result) {
+          let tweet = node[key].result;
+          if (tweet.__typename === 'TweetWithVisibilityResults') tweet = tweet.tweet || {};
+          if (tweet.legacy) tweets.push(tweet);
+        }
+        walk(node[key], tweets, cursors);
+      }
+    }
+  };
+  const screenName = (tweet) => {
+    let user = ((tweet.core || {}).user_results || {}).result || {};
+    if (user.__typename === 'UserWithVisibilityResults') user = user.user || {};
+    return (user.core || {}).screen_name || (user.legacy || {}).screen_name;
+  };
+  // Same markup the scraper's DOM harvester reads: the author link inside
+  // User-Name and a status link around <time>.
+  const renderReply = (tweet) => {
+    const id = tweet.rest_id || tweet.legacy.id_str, name = screenName(tweet);
+    if (!id || !name || rendered.has(id) || BigInt(id) <= BigInt(focalTweetId)) return;
+    rendered.add(id);
+    const article = document.createElement('article');
+    article.setAttribute('data-testid', 'tweet');
+    article.style.minHeight = '120px';
+    const user = document.createElement('div');
+    user.setAttribute('data-testid', 'User-Name');
+    const profile = document.createElement('a');
+    profile.setAttribute('href', '/' + name);
+    profile.setAttribute('role', 'link');
+    profile.textContent = '@' + name;
+    const status = document.createElement('a');
+    status.setAttribute('href', '/' + name + '/status/' + id);
+    status.appendChild(document.createElement('time'));
+    user.append(profile, status);
+    const text = document.createElement('div');
+    text.textContent = tweet.legacy.full_text || '';
+    article.append(user, text);
+    list.appendChild(article);
+  };
+  const renderShowMore = (value) => {
+    if (offered.has(value)) return;
+    offered.add(value);
+    const button = document.createElement('div');
+    button.setAttribute('role', 'button');
+    button.textContent = 'Show more replies';
+    button.addEventListener('click', () => { button.remove(); fetchPage(value); });
+    list.appendChild(button);
+  };
+  // Renders one TweetDetail page and returns its Bottom cursor.
+  const fetchPage = async (value) => {
+    const variables = encodeURIComponent(JSON.stringify({focalTweetId, cursor: value}));
+    const response = await fetch('/i/api/graphql/replay/TweetDetail?variables=' + variables);
+    if (!response.ok) return null;
+    const tweets = [], cursors = {};
+    walk(await response.json(), tweets, cursors);
+    tweets.forEach(renderReply);
+    for (const type of SHOW_MORE_CURSORS) if (cursors[type]) renderShowMore(cursors[type]);
+    return cursors.Bottom || null;
+  };
+  const loadNext = async () => {
+    if (loading || done) return;
+    loading = true;
+    try {
+      const next = await fetchPage(cursor);
+      if (!next || next === cursor) done = true;
+      cursor = next;
+    } finally {
+      loading = false;
+    }
+  };
+  window.addEventListener('scroll', () => {
+    if (window.innerHeight + window.scrollY >= document.body.scrollHeight - 200) loadNext();
+  });
+  loadNext();
+})();
+</script>
+"""
+
+
+def sanitize_html(html: str, tweet_id: str) -> str:
+    """Drops X's own scripts and external resources, and adds the replay script."""
+    html = _SCRIPT_TAG_PATTERN.sub("", html)
+    html = _EXTERNAL_LINK_PATTERN.sub("", html)
+    html = _EXTERNAL_SRC_PATTERN.sub("", html)
+    replay = _REPLAY_JS % {"tweet_id": json.dumps(tweet_id)}
+    if "</body>" in html:
+        return html.replace("</body>", replay + "</body>", 1)
+    return html + replay
+
+
+class _ReplayIndex:
+    """Maps every cursor found in a recorded response to the response after it."""
+
+    def __init__(self, fixture):
+        self.fixture = fixture
+        self.next_page = {}
+        for index in range(len(fixture.detail_files)):
+            payload = json.loads(fixture.read_detail(index))
+            for value in parse_tweet_detail(payload, fixture.tweet_id).cursors.values():
+                self.next_page.setdefault(value, index + 1)
+
+    def page_for(self, cursor) -> int:
+        """Returns the index of the page to serve; len(detail_files) means "past the end"."""
+        if not cursor:
+            return 0 if self.fixture.detail_files else None
+        return self.next_page.get(cursor)
+
+
+class FixtureServer:
+    """Runs the replay HTTP server in a background thread."""
+
+    def __init__(self, fixtures_dir: str = FIXTURES_DIR, host: str = "127.0.0.1", port: int = 0,
+                 latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.fixtures = load_fixtures(fixtures_dir)
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.requests_served = 0
+        self._indexes = {tweet_id: _ReplayIndex(f) for tweet_id, f in self.fixtures.items()}
+        self._pages = {tweet_id: sanitize_html(f.read_html(), tweet_id)
+                       for tweet_id, f in self.fixtures.items()}
+        self._httpd = None
+        self._thread = None
+
+    def url_for(self, tweet_id: str) -> str:
+        return f"http://{self.host}:{self.port}/replay/status/{tweet_id}"
+
+    def delay(self):
+        seconds = (self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests_served += 1
+                server.delay()
+                parsed = urlparse(self.path)
+                match = STATUS_PATH_PATTERN.match(parsed.path)
+                if match and match.group(1) in server._pages:
+                    return self._send(200, "text/html; charset=utf-8",
+                                      server._pages[match.group(1)].encode("utf-8"))
+                if DETAIL_PATH_PATTERN.match(parsed.path):
+                    return self._send_detail(parse_qs(parsed.query))
+                self._send(404, "text/plain", b"not found")
+
+            def _send_detail(self, query):
+                try:
+                    variables = json.loads(query.get("variables", ["{}"])[0])
+                except ValueError:
+                    return self._send(400, "text/plain", b"bad variables")
+                index = server._indexes.get(str(variables.get("focalTweetId")))
+                page = index.page_for(variables.get("cursor")) if index else None
+                if page is None:
+                    return self._send(404, "text/plain", b"no such page")
+                if page >= len(index.fixture.detail_files):
+                    # Like X, the cursor of the last page leads to an empty page.
+                    return self._send(200, "application/json", EMPTY_DETAIL_PAGE)
+                self._send(200, "application/json", index.fixture.read_detail(page))
+
+            def _send(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        print(f"Fixture server with {len(self.fixtures)} fixture(s) on http://{self.host}:{self.port} "
+              f"({self.latency_ms:.0f} ms latency, {self.jitter_ms:.0f} ms jitter).")
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded tweet fixtures on localhost.")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FixtureServer(args.fixtures, args.host, args.port, args.latency_ms, args.jitter_ms)
+    server.start()
+    for tweet_id in server.fixtures:
+        print(f"  {server.url_for(tweet_id)}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
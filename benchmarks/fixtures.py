@@ -0,0 +1,71 @@
+# benchmarks/fixtures.py
+# On-disk layout of recorded tweet pages:
+#   <fixtures dir>/<tweet id>/meta.json          url, handles seen while recording, timestamp
+#   <fixtures dir>/<tweet id>/page.html          the rendered page after scrolling
+#   <fixtures dir>/<tweet id>/tweet_detail_000.json, _001.json, ...
+#                                                TweetDetail responses in the order they arrived
+import json
+import os
+import time
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+class Fixture:
+    """One recorded tweet page."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.tweet_id = self.meta["tweet_id"]
+        self.detail_files = sorted(
+            name for name in os.listdir(path)
+            if name.startswith("tweet_detail_") and name.endswith(".json"))
+
+    @property
+    def expected_handles(self) -> set:
+        """Every handle seen while recording, used to measure recall."""
+        return set(self.meta.get("handles") or ())
+
+    def read_html(self) -> str:
+        with open(os.path.join(self.path, "page.html"), "r", encoding="utf-8") as f:
+            return f.read()
+
+    def read_detail(self, index: int) -> bytes:
+        with open(os.path.join(self.path, self.detail_files[index]), "rb") as f:
+            return f.read()
+
+
+def save_fixture(fixtures_dir: str, url: str, tweet_id: str, html: str,
+                 detail_payloads: list, handles) -> str:
+    """Writes one recorded page to disk and returns its directory."""
+    path = os.path.join(fixtures_dir, tweet_id)
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "page.html"), "w", encoding="utf-8") as f:
+        f.write(html)
+    for index, payload in enumerate(detail_payloads):
+        with open(os.path.join(path, f"tweet_detail_{index:03d}.json"), "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "url": url,
+            "tweet_id": tweet_id,
+            "handles": sorted(handles),
+            "detail_pages": len(detail_payloads),
+            "recorded_at": int(time.time()),
+        }, f, indent=2)
+    return path
+
+
+def load_fixtures(fixtures_dir: str = FIXTURES_DIR) -> dict:
+    """Returns every fixture in the directory, keyed by tweet ID."""
+    fixtures = {}
+    if not os.path.isdir(fixtures_dir):
+        return fixtures
+    for name in sorted(os.listdir(fixtures_dir)):
+        path = os.path.join(fixtures_dir, name)
+        if os.path.isfile(os.path.join(path, "meta.json")):
+            fixture = Fixture(path)
+            fixtures[fixture.tweet_id] = fixture
+    return fixtures
@@ -0,0 +1,81 @@
+# benchmarks/record_fixtures.py
+# Records live tweet pages into replay fixtures for the benchmark suite.
+#   python -m benchmarks.record_fixtures --auth user_data/123/auth.json URL [URL ...]
+# The page is scrolled the same way the scraper does it, then the rendered HTML
+# and every TweetDetail response seen along the way are saved.
+import argparse
+import asyncio
+from playwright.async_api import async_playwright
+import scraper
+from browser_pool import BROWSER_LAUNCH_ARGS
+from tweet_detail import TWEET_DETAIL_ENDPOINT
+from benchmarks.fixtures import FIXTURES_DIR, save_fixture
+
+
+async def record_tweet(context, url: str, fixtures_dir: str) -> str:
+    tweet_id = scraper.extract_tweet_id(url)
+    if not tweet_id:
+        raise ValueError(f"Not a tweet URL: {url}")
+
+    payloads = []
+    pending = set()
+
+    async def keep(response):
+        try:
+            if response.ok:
+                payloads.append(await response.json())
+        except Exception as e:
+            print(f"Could not read a TweetDetail response: {e}")
+
+    def on_response(response):
+        if TWEET_DETAIL_ENDPOINT in response.url:
+            task = asyncio.ensure_future(keep(response))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+    page = await context.new_page()
+    page.on("response", on_response)
+    try:
+        await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+        await page.wait_for_selector('article[data-testid="tweet"]', timeout=30000)
+        await page.evaluate(scraper._INSTALL_HARVESTER_JS, {"focalId": tweet_id})
+        rounds, reason = await scraper.scroll_until_stable(page)
+        print(f"Scrolled {rounds} time(s) on {url}: {reason}.")
+        handles = await page.evaluate(scraper._COLLECT_HANDLES_JS)
+        if pending:
+            await asyncio.gather(*list(pending), return_exceptions=True)
+        html = await page.content()
+    finally:
+        await page.close()
+
+    path = save_fixture(fixtures_dir, url, tweet_id, html, payloads, handles)
+    print(f"Saved {len(payloads)} TweetDetail response(s) and {len(handles)} handle(s) to {path}.")
+    return path
+
+
+async def record_fixtures(urls: list, auth_file: str, fixtures_dir: str):
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True, args=BROWSER_LAUNCH_ARGS)
+        context = await browser.new_context(storage_state=auth_file)
+        try:
+            for url in urls:
+                try:
+                    await record_tweet(context, url, fixtures_dir)
+                except Exception as e:
+                    print(f"Could not record {url}: {e}")
+        finally:
+            await context.close()
+            await browser.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record tweet pages as replay fixtures.")
+    parser.add_argument("urls", nargs="+", help="tweet URLs to record")
+    parser.add_argument("--auth", required=True, help="Playwright storage-state file to log in with")
+    parser.add_argument("--out", default=FIXTURES_DIR, help="fixtures directory")
+    args = parser.parse_args()
+    asyncio.run(record_fixtures(args.urls, args.auth, args.out))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,13 @@ import re
 import json
 import random
 import scraper
+import asyncio
+import browser_pool
+import coordinator
+import metrics
+import report_writer
+import scrape_worker
+from config import env_int
 from typing import Union
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
@@ -16,6 +23,7 @@ from telegram.ext import (
 from telegram.constants import ParseMode
 from telegram import Update, MessageEntity, BotCommand, BotCommandScopeAllPrivateChats, BotCommandScopeAllGroupChats, ReactionTypeEmoji
 import database
+import async_database
 
 # Load environment variables
 load_dotenv()
@@ -24,6 +32,28 @@ load_dotenv()
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
 
+# Delay before an interrupted verification is resumed.
+VERIFICATION_RETRY_DELAY_SECONDS = 60
+
+# An interrupted verification is resumed at most this many times; after that
+# the raid is reported with the links that did finish.
+MAX_VERIFICATION_RETRIES = 5
+
+# How often the bot re-checks the queue while remote workers hold tasks of a raid.
+VERIFICATION_POLL_SECONDS = 5
+
+# Tasks still open this long after verification started are given up on, so
+# the raid is reported and archived with the links that did finish.
+DEFAULT_VERIFICATION_MAX_SECONDS = 3 * 3600
+
+# While a raid is verified, its status message is edited with partial results
+# at most this often (Telegram limits how fast a message may be edited).
+DEFAULT_PROGRESS_EDIT_SECONDS = 10
+
+# How many random links are verified per raid. Set VERIFICATION_SAMPLE_SIZE=0
+# to verify every submitted link (sharded across all scrape worker processes).
+DEFAULT_VERIFICATION_SAMPLE_SIZE = 5
+
 # --- Conversation States ---
 (
     AWAITING_HANDLE, AWAITING_AUTH_JSON, AWAITING_DURATIONS
@@ -69,12 +99,12 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Displays the user's profile information, including groups."""
     user_id = update.message.from_user.id
-    user_data = database.get_user_profile(user_id)
+    user_data = await async_database.get_user_profile(user_id)
 
     if user_data:
         x_handle, auth_count, completed, total = user_data
 
-        user_groups = database.get_groups_for_user(user_id)
+        user_groups = await async_database.get_groups_for_user(user_id)
         if user_groups:
             groups_text = "\n".join(f"  - `{group}`" for group in user_groups)
         else:
@@ -126,7 +156,7 @@ async def receive_handle(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     if not handle.startswith('@'):
         handle = f"@{handle}"
     user_id = update.message.from_user.id
-    database.connect_user_profile(user_id, handle)
+    await async_database.connect_user_profile(user_id, handle)
     await update.message.reply_text(f"✅ Your profile is now connected to `{handle}`!", parse_mode=ParseMode.MARKDOWN)
     return ConversationHandler.END
 
@@ -179,7 +209,8 @@ async def receive_auth_file(update: Update, context: ContextTypes.DEFAULT_TYPE)
         with open(file_path, 'w', encoding='utf-8') as f:
             f.write(json_text)
 
-        database.update_auth_file_count(user_id, file_count + 1)
+        await async_database.add_auth_file(user_id, file_path)
+        await async_database.update_auth_file_count(user_id, file_count + 1)
         await update.message.reply_text(f"✅ Auth file received and saved! You now have **{file_count + 1}** auth file(s).", parse_mode=ParseMode.MARKDOWN)
         return ConversationHandler.END
 
@@ -256,7 +287,7 @@ async def on_group_join(update: Update, context: ContextTypes.DEFAULT_TYPE):
     adder_user = update.message.from_user
     chat = update.message.chat
     if context.bot.id in [member.id for member in update.message.new_chat_members]:
-        database.add_user_to_group(adder_user.id, chat.id, chat.title)
+        await async_database.add_user_to_group(adder_user.id, chat.id, chat.title)
         await update.message.reply_text(
             f"Hello! I'm the Comment Verifier Bot, added by {adder_user.mention_markdown()}.\n\n"
             "An admin can start a new raid by using the `/start_raid` command.\n\n"
@@ -275,7 +306,7 @@ async def ongoing_raid_command(update: Update, context: ContextTypes.DEFAULT_TYP
         return
 
     chat_id = update.message.chat_id
-    raid_details = database.get_active_raid_details(chat_id)
+    raid_details = await async_database.get_active_raid_details(chat_id)
 
     if not raid_details:
         await update.message.reply_text("There is no raid currently active in this group.")
@@ -298,7 +329,7 @@ async def ongoing_raid_command(update: Update, context: ContextTypes.DEFAULT_TYP
         time_left_str = "Ended"
 
     # Get the list of links
-    raid_links = database.get_links_for_raid(raid_id)
+    raid_links = await async_database.get_links_for_raid(raid_id)
 
     if not raid_links:
         links_section = "No links have been submitted yet. Post X.com links in the chat to add them."
@@ -336,7 +367,7 @@ async def start_raid_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update.message.reply_text("Only group admins can start a raid.")
         return ConversationHandler.END
 
-    if database.get_active_raid_id(chat_id):
+    if await async_database.get_active_raid_id(chat_id):
         await update.message.reply_text("A raid is already active in this group. Please wait for it to finish.")
         return ConversationHandler.END
 
@@ -366,7 +397,7 @@ async def end_raid_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         await update.message.reply_text("Only group admins can end a raid.")
         return
 
-    raid_id = database.get_active_raid_id(chat_id)
+    raid_id = await async_database.get_active_raid_id(chat_id)
     if not raid_id:
         await update.message.reply_text("There is no raid currently active to end.")
         return
@@ -380,40 +411,188 @@ async def end_raid_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     await _run_raid_verification(chat_id, raid_id, context)
 
 
-async def _run_raid_verification(chat_id: int, raid_id: int, context: ContextTypes.DEFAULT_TYPE):
-    """The core logic for ending a raid and running the scraper."""
+async def _run_raid_verification(chat_id: int, raid_id: int, context: ContextTypes.DEFAULT_TYPE,
+                                 retries: int = 0):
+    """
+    The core logic for ending a raid and running the scraper. Progress is
+    checkpointed per URL in the verification queue, so calling this again for
+    the same raid (e.g. after a restart) resumes where it stopped.
+    """
     # 1. Gather data for the scraper
-    all_links = database.get_links_for_raid(raid_id)
-    participants = database.get_raid_participants_with_handles(raid_id)
+    all_links = await async_database.get_links_for_raid(raid_id)
+    participants = await async_database.get_raid_participants_with_handles(raid_id)
 
     if not all_links or not participants:
         await context.bot.send_message(chat_id, f"Raid #{raid_id} is ending, but no links or participants were found. The raid will now be archived.")
-        database.deactivate_raid(raid_id)
+        await async_database.deactivate_raid(raid_id)
         return
 
     # 2. Prepare data for the scraper function
-    links_to_check = random.sample(all_links, k=min(5, len(all_links)))
     participant_ids = [p[0] for p in participants]
     target_usernames = [p[1] for p in participants]
 
-    await context.bot.send_message(
-        chat_id,
+    if not await async_database.get_auth_files_for_users(participant_ids):
+        await context.bot.send_message(chat_id, scraper.NO_AUTH_FILES_REPORT, parse_mode='Markdown')
+        await async_database.deactivate_raid(raid_id)
+        await context.bot.send_message(chat_id, f"Raid #{raid_id} is now complete and has been archived.")
+        return
+
+    # The sample is stored with the job, so a resumed verification checks the same links.
+    sample_size = env_int("VERIFICATION_SAMPLE_SIZE",
+                          DEFAULT_VERIFICATION_SAMPLE_SIZE)
+    if sample_size > 0:
+        sampled_links = random.sample(
+            all_links, k=min(sample_size, len(all_links)))
+    else:
+        sampled_links = all_links
+    links_to_check = await async_database.create_verification_job(
+        raid_id, chat_id, sampled_links)
+    checks_all_links = len(links_to_check) == len(all_links)
+    links_label = "" if checks_all_links else " random"
+
+    status_header = (
         f"⏳ **Raid #{raid_id} submission time has ended!**\n\n"
-        f"🔬 Analyzing **{len(links_to_check)}** random links against **{len(target_usernames)}** participants. This may take a few minutes...",
-        parse_mode='Markdown'
+        f"🔬 Analyzing **{len(links_to_check)}**{links_label} links against **{len(target_usernames)}** participants. This may take a few minutes..."
     )
+    status_message = await context.bot.send_message(
+        chat_id, status_header, parse_mode='Markdown')
+    progress = _VerificationProgress(
+        context.bot, status_message, status_header, raid_id, target_usernames, len(links_to_check))
+    progress_task = asyncio.create_task(progress.stream())
 
     # 3. Run the scraper
     try:
-        report = await scraper.run_scrape_and_check(participant_ids, links_to_check, target_usernames)
-        await context.bot.send_message(chat_id, report, parse_mode='Markdown')
+        # Local workers drain the queue; remote workers (via the coordinator) may
+        # still hold some tasks, so keep going until every task is closed. Tasks
+        # whose remote worker went silent become claimable again when their lease expires.
+        deadline = asyncio.get_running_loop().time() + env_int(
+            "VERIFICATION_MAX_SECONDS", DEFAULT_VERIFICATION_MAX_SECONDS)
+        while True:
+            if scrape_worker.shared_workers.is_running:
+                # Scraping runs in worker processes; this loop only awaits the result.
+                # Every worker process claims URLs from the raid's queue in parallel.
+                await scrape_worker.shared_workers.run_verification_sharded(raid_id, participant_ids, target_usernames)
+            else:
+                await scraper.run_verification_tasks(raid_id, participant_ids, target_usernames)
+            await async_database.fail_exhausted_verification_tasks(raid_id)
+            if not await async_database.count_open_verification_tasks(raid_id):
+                break
+            if asyncio.get_running_loop().time() > deadline:
+                abandoned = await async_database.fail_open_verification_tasks(raid_id)
+                logging.warning(f"Gave up on {abandoned} unfinished task(s) of raid {raid_id}.")
+                break
+            await asyncio.sleep(VERIFICATION_POLL_SECONDS)
+
+        progress_task.cancel()
+        await progress.update()
+        results = scraper.load_task_results(
+            await async_database.get_verification_task_results(raid_id))
+        for result in results:
+            metrics.observe_scrape(result, scraper.session_outcome(result))
+        summary = report_writer.summarize_results(
+            results, target_usernames, sampled=not checks_all_links)
+        await report_writer.send_verification_report(context.bot, chat_id, raid_id, summary)
     except Exception as e:
         logging.error(f"Scraper failed for raid {raid_id}: {e}")
+        progress_task.cancel()
+        # Whatever finished before the failure stays visible in the status message.
+        await progress.update()
+        open_tasks = await async_database.count_open_verification_tasks(raid_id)
+        if open_tasks and retries < MAX_VERIFICATION_RETRIES:
+            # Finished URLs are checkpointed; keep the raid active and resume shortly.
+            context.job_queue.run_once(
+                auto_end_raid_callback,
+                when=VERIFICATION_RETRY_DELAY_SECONDS,
+                data={'chat_id': chat_id, 'raid_id': raid_id, 'retries': retries + 1},
+                name=f"raid_end_{raid_id}"
+            )
+            await context.bot.send_message(chat_id, f"⚠️ Verification of Raid #{raid_id} was interrupted. It will resume automatically in a minute.")
+            return
+        if open_tasks:
+            await async_database.fail_open_verification_tasks(raid_id)
         await context.bot.send_message(chat_id, "Sorry, an unexpected error occurred during the verification process.")
-    finally:
-        # 4. Deactivate the raid
-        database.deactivate_raid(raid_id)
-        await context.bot.send_message(chat_id, f"Raid #{raid_id} is now complete and has been archived.")
+
+    # 4. Deactivate the raid
+    await async_database.finish_verification_job(raid_id)
+    await async_database.deactivate_raid(raid_id)
+    await context.bot.send_message(chat_id, f"Raid #{raid_id} is now complete and has been archived.")
+
+
+def _load_finished_results(raid_id: int, since_timestamp: int) -> list:
+    """Runs on the database thread: [(task_id, updated_timestamp, result), ...] closed since `since_timestamp`."""
+    rows = database.get_finished_verification_tasks(raid_id, since_timestamp)
+    results = scraper.load_task_results([row[2:] for row in rows])
+    return [(row[0], row[1], result) for row, result in zip(rows, results)]
+
+
+class _VerificationProgress:
+    """Edits a raid's status message with the tally of the links finished so far."""
+
+    def __init__(self, bot, message, header: str, raid_id: int, target_usernames: list, total_links: int):
+        self.bot = bot
+        self.message = message
+        self.header = header
+        self.raid_id = raid_id
+        self.tally = report_writer.ProgressTally(target_usernames, total_links)
+        self._last_text = header
+        # Only tasks closed since the last update are read and parsed (on the
+        # database thread); the tally keeps the counts of the earlier ones.
+        self._counted_task_ids = set()
+        self._since_timestamp = 0
+
+    async def update(self):
+        """Edits the message if any link finished since the last edit."""
+        try:
+            finished = await async_database.run(
+                _load_finished_results, self.raid_id, self._since_timestamp)
+            new_results = []
+            for task_id, updated_timestamp, result in finished:
+                if task_id in self._counted_task_ids:
+                    continue
+                self._counted_task_ids.add(task_id)
+                self._since_timestamp = max(self._since_timestamp, updated_timestamp or 0)
+                new_results.append(result)
+            self.tally.add(new_results)
+            text = self.header + "\n\n" + self.tally.text()
+            if text == self._last_text:
+                return
+            await self.bot.edit_message_text(
+                text, chat_id=self.message.chat_id, message_id=self.message.message_id, parse_mode='Markdown')
+            self._last_text = text
+        except Exception as e:
+            logging.warning(f"Could not update the status of raid {self.raid_id}: {e}")
+
+    async def stream(self):
+        """Updates the message every few seconds until cancelled."""
+        interval = max(1, env_int("VERIFICATION_PROGRESS_EDIT_SECONDS",
+                                  DEFAULT_PROGRESS_EDIT_SECONDS))
+        while True:
+            await asyncio.sleep(interval)
+            await self.update()
+
+
+async def _schedule_raid_recovery(application: Application):
+    """
+    Re-schedules verification for every raid that is still active. Raids whose
+    engagement period ended while the bot was down are verified right away,
+    resuming from their checkpointed tasks.
+    """
+    released = await async_database.release_running_verification_tasks()
+    if released:
+        print(f"Re-queued {released} interrupted verification task(s).")
+
+    now_ts = int(datetime.now().timestamp())
+    for raid_id, group_id, engagement_deadline_ts in await async_database.get_active_raids():
+        name = f"raid_end_{raid_id}"
+        if application.job_queue.get_jobs_by_name(name):
+            continue
+        application.job_queue.run_once(
+            auto_end_raid_callback,
+            when=max(0, engagement_deadline_ts - now_ts),
+            data={'chat_id': group_id, 'raid_id': raid_id},
+            name=name
+        )
+        print(f"Scheduled verification for active raid #{raid_id}.")
 
 
 async def auto_end_raid_callback(context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -422,7 +601,7 @@ async def auto_end_raid_callback(context: ContextTypes.DEFAULT_TYPE) -> None:
     chat_id = job.data["chat_id"]
     raid_id = job.data["raid_id"]
 
-    await _run_raid_verification(chat_id, raid_id, context)
+    await _run_raid_verification(chat_id, raid_id, context, job.data.get("retries", 0))
 
 
 async def receive_durations(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -462,7 +641,7 @@ async def receive_durations(update: Update, context: ContextTypes.DEFAULT_TYPE)
     engagement_deadline_ts = int(engagement_deadline.timestamp())
 
     chat_id = update.message.chat_id
-    raid_id = database.create_new_raid(
+    raid_id = await async_database.create_new_raid(
         chat_id, submission_deadline_ts, engagement_deadline_ts
     )
 
@@ -489,7 +668,7 @@ async def receive_durations(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 
 async def post_init(application: Application):
-    """Sets the bot's command menus."""
+    """Sets the bot's command menus and starts the scraper workers (or browser pool)."""
     private_commands = [
         BotCommand("start", "↩️ Main Menu & Welcome"),
         BotCommand("profile", "👤 View Your Profile"),
@@ -510,6 +689,55 @@ async def post_init(application: Application):
 
     print("Custom command menus have been set.")
 
+    await _schedule_raid_recovery(application)
+
+    # Prometheus-style scraper metrics, e.g. METRICS_PORT=9100.
+    metrics_port = env_int("METRICS_PORT", 0)
+    if metrics_port:
+        try:
+            metrics.start_metrics_server(
+                metrics_port, os.getenv("METRICS_HOST", "127.0.0.1"))
+        except Exception as e:
+            logging.error(f"Could not start the metrics server: {e}")
+
+    # Remote scrape workers on other hosts connect here (see scrape_worker.py).
+    coordinator_port = env_int("COORDINATOR_PORT", 0)
+    if coordinator_port:
+        try:
+            coordinator.shared_coordinator = coordinator.TaskCoordinator(
+                os.getenv("COORDINATOR_TOKEN"))
+            await coordinator.shared_coordinator.start(
+                os.getenv("COORDINATOR_HOST", "127.0.0.1"), coordinator_port)
+        except Exception as e:
+            coordinator.shared_coordinator = None
+            logging.error(f"Could not start the task coordinator: {e}")
+
+    # SCRAPER_WORKER_PROCESSES=0 keeps scraping inside the bot process.
+    if env_int("SCRAPER_WORKER_PROCESSES", scrape_worker.DEFAULT_WORKER_PROCESSES) > 0:
+        try:
+            scrape_worker.shared_workers.start()
+            return
+        except Exception as e:
+            logging.error(f"Could not start the scrape worker processes: {e}")
+
+    if not scraper.uses_warm_browser():
+        return
+    try:
+        await browser_pool.shared_pool.start()
+    except Exception as e:
+        # Verification still works without the pool; it will launch a browser per raid.
+        logging.error(f"Could not start the shared browser pool: {e}")
+
+
+async def post_shutdown(application: Application):
+    """Stops the coordinator, scraper workers, shared browser pool and metrics server when the application stops."""
+    metrics.stop_metrics_server()
+    if coordinator.shared_coordinator is not None:
+        await coordinator.shared_coordinator.stop()
+    scrape_worker.shared_workers.stop()
+    await browser_pool.shared_pool.stop()
+    await async_database.close()
+
 
 async def link_collector(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
@@ -521,12 +749,12 @@ async def link_collector(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # RULE 1: Check if the user is registered with the bot
     user_id = update.message.from_user.id
-    if not database.is_user_registered(user_id):
+    if not await async_database.is_user_registered(user_id):
         return  # Silently ignore if the user hasn't signed up in the bot's DM.
 
     # Check for an active raid in this group
     chat_id = update.message.chat_id
-    raid_details = database.get_active_raid_details(chat_id)
+    raid_details = await async_database.get_active_raid_details(chat_id)
     if not raid_details:
         return  # No active raid, do nothing.
 
@@ -557,7 +785,7 @@ async def link_collector(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # RULE 3: Attempt to submit the link (database handles the one-per-user logic)
     # This function returns True if successful, False if they already submitted.
-    was_successful = database.add_raid_link_and_mark_submitted(
+    was_successful = await async_database.add_raid_link_and_mark_submitted(
         raid_id, user_id, first_valid_url)
 
     # Only react if the link was successfully added.
@@ -599,6 +827,11 @@ def main() -> None:
     persistence = PicklePersistence(filepath="raid_bot_persistence.pkl")
 
     database.initialize_database()
+    # No scraper process runs yet, so any auth session lease is left over from a crash.
+    database.release_all_auth_session_leases()
+    newly_registered = database.register_existing_auth_files()
+    if newly_registered:
+        print(f"Registered {newly_registered} existing auth file(s).")
 
     # 3. Build the application, passing the JobQueue and persistence objects
     application = (
@@ -607,6 +840,7 @@ def main() -> None:
         .persistence(persistence)
         .job_queue(job_queue)  # <-- Explicitly add the job queue here
         .post_init(post_init)
+        .post_shutdown(post_shutdown)
         .build()
     )
 
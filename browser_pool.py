@@ -0,0 +1,172 @@
+# browser_pool.py
+# A process-wide pool of warm headless Chromium instances shared by all raids.
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+from config import env_int
+import resource_monitor
+
+BROWSER_LAUNCH_ARGS = [
+    "--disable-blink-features=AutomationControlled", "--no-sandbox"]
+DEFAULT_POOL_SIZE = 1
+# A browser is replaced by a fresh one after serving this many contexts,
+# which returns the memory Chromium accumulates over a long session. 0 disables it.
+DEFAULT_RECYCLE_AFTER_CONTEXTS = 200
+# After a recycle caused by the memory budget, wait this long before the next
+# one so the new browser's memory reading can settle.
+MEMORY_RECYCLE_COOLDOWN = 30.0
+
+
+class BrowserPool:
+    """
+    Keeps one or more headless Chromium browsers running and hands out fresh
+    contexts from them in round-robin order. A browser that crashes or
+    disconnects is relaunched the next time a context is requested.
+    A browser that served BROWSER_RECYCLE_AFTER_CONTEXTS contexts, or the
+    busiest one while the process is over its memory budget, is retired: new
+    contexts go to a fresh browser and the old one closes once its last
+    context is closed.
+    """
+
+    def __init__(self, size: int = None):
+        self.size = size
+        self._playwright = None
+        self._browsers = []
+        self._served = []
+        self._open_contexts = {}
+        self._retired = set()
+        self._last_memory_recycle = 0.0
+        self._next_index = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self._playwright is not None
+
+    async def start(self):
+        """Starts Playwright and launches the warm browsers. Safe to call twice."""
+        async with self._lock:
+            if self.is_running:
+                return
+            if self.size is None:
+                self.size = env_int("BROWSER_POOL_SIZE", DEFAULT_POOL_SIZE)
+            self.size = max(1, self.size)
+            self._playwright = await async_playwright().start()
+            self._browsers = [None] * self.size
+            self._served = [0] * self.size
+            for index in range(self.size):
+                await self._launch(index)
+        print(f"Browser pool started with {self.size} warm browser(s).")
+
+    async def stop(self):
+        """Closes every browser and stops Playwright."""
+        async with self._lock:
+            if not self.is_running:
+                return
+            for browser in self._browsers + list(self._retired):
+                if browser is not None and browser.is_connected():
+                    try:
+                        await browser.close()
+                    except Exception as e:
+                        print(f"Error while closing a pooled browser: {e}")
+            self._browsers = []
+            self._retired.clear()
+            self._open_contexts.clear()
+            await self._playwright.stop()
+            self._playwright = None
+        print("Browser pool stopped.")
+
+    async def _launch(self, index: int):
+        browser = await self._playwright.chromium.launch(
+            headless=True, args=BROWSER_LAUNCH_ARGS)
+        self._browsers[index] = browser
+        self._served[index] = 0
+        self._open_contexts[browser] = 0
+        return browser
+
+    def _recycle_reason(self, index: int):
+        limit = env_int("BROWSER_RECYCLE_AFTER_CONTEXTS",
+                        DEFAULT_RECYCLE_AFTER_CONTEXTS)
+        if limit > 0 and self._served[index] >= limit:
+            return f"served {self._served[index]} contexts"
+        if (time.monotonic() - self._last_memory_recycle > MEMORY_RECYCLE_COOLDOWN
+                and self._served[index] == max(self._served)
+                and resource_monitor.over_memory_budget()):
+            self._last_memory_recycle = time.monotonic()
+            return "over the memory budget"
+        return None
+
+    async def _retire(self, browser):
+        """Closes a retired browser once none of its contexts is open."""
+        if browser not in self._retired or self._open_contexts.get(browser, 0) > 0:
+            return
+        self._retired.discard(browser)
+        self._open_contexts.pop(browser, None)
+        try:
+            await browser.close()
+        except Exception as e:
+            print(f"Error while closing a retired browser: {e}")
+
+    def _context_closed(self, browser):
+        self._open_contexts[browser] = max(0, self._open_contexts.get(browser, 0) - 1)
+        if browser in self._retired and self._open_contexts[browser] == 0:
+            asyncio.ensure_future(self._retire(browser))
+
+    async def _get_browser(self):
+        """Returns the next healthy browser, relaunching it if it has died."""
+        async with self._lock:
+            if not self.is_running:
+                raise RuntimeError("The browser pool has not been started.")
+            index = self._next_index % len(self._browsers)
+            self._next_index += 1
+            browser = self._browsers[index]
+            if browser is None or not browser.is_connected():
+                print(f"Pooled browser #{index} is not connected. Relaunching...")
+                browser = await self._launch(index)
+            else:
+                reason = self._recycle_reason(index)
+                if reason:
+                    print(f"Recycling pooled browser #{index}: {reason}.")
+                    self._retired.add(browser)
+                    asyncio.ensure_future(self._retire(browser))
+                    browser = await self._launch(index)
+            self._served[index] += 1
+            return browser
+
+    async def new_context(self, **kwargs):
+        """Creates a new browser context. The caller is responsible for closing it."""
+        browser = await self._get_browser()
+        try:
+            context = await browser.new_context(**kwargs)
+        except Exception:
+            # The browser may have crashed between the health check and this call.
+            if browser.is_connected():
+                raise
+            browser = await self._get_browser()
+            context = await browser.new_context(**kwargs)
+        self._open_contexts[browser] = self._open_contexts.get(browser, 0) + 1
+        context.on("close", lambda _: self._context_closed(browser))
+        return context
+
+
+# The shared pool used by the bot. It is started from the bot's post_init hook.
+shared_pool = BrowserPool()
+
+
+@asynccontextmanager
+async def acquire_pool():
+    """
+    Yields the shared pool if it is running. Otherwise a temporary pool is
+    started for the duration of the block (e.g. when the scraper runs standalone).
+    """
+    if shared_pool.is_running:
+        yield shared_pool
+        return
+
+    temporary_pool = BrowserPool(size=1)
+    await temporary_pool.start()
+    try:
+        yield temporary_pool
+    finally:
+        await temporary_pool.stop()
@@ -0,0 +1,29 @@
+# config.py
+# Small helpers for reading tunable settings from the environment.
+# Values are read at call time so that settings from the .env file (loaded by
+# bot.py after its imports) are always picked up.
+import os
+
+
+def env_int(name: str, default: int) -> int:
+    """Reads an integer setting from the environment, falling back to the default."""
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"Invalid integer for {name}: {value!r}. Using default {default}.")
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    """Reads a float setting from the environment, falling back to the default."""
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        print(f"Invalid number for {name}: {value!r}. Using default {default}.")
+        return default
@@ -0,0 +1,200 @@
+# coordinator.py
+# Hands verification tasks to remote scrape workers over a small TCP protocol.
+#
+# Protocol: newline-delimited JSON, one request and one response per line.
+#   {"op": "claim", "token": ..., "worker_id": ...}
+#       -> {"ok": true, "task": {"task_id", "raid_id", "url", "target_handles",
+#                                "storage_state", "lease_seconds"} or null}
+#   {"op": "heartbeat", "token": ..., "worker_id": ..., "task_id": ...}
+#       -> {"ok": true, "still_assigned": bool}
+#   {"op": "complete", "token": ..., "worker_id": ..., "task_id": ..., "result": {...}}
+#       -> {"ok": true, "recorded": bool}   (false: the task was reassigned, result dropped)
+# A task whose worker stops sending heartbeats is reassigned once its lease expires.
+import asyncio
+import hmac
+import json
+import time
+import async_database
+import scraper
+import session_pool
+
+DEFAULT_LEASE_SECONDS = 90
+# Storage states and large handle sets do not fit the default 64 KiB line limit.
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+# How long a claim waits for a free auth session before handing the task back.
+SESSION_ACQUIRE_TIMEOUT = 5.0
+
+
+class _Assignment:
+    """A task currently leased to a remote worker."""
+
+    def __init__(self, worker_id: str, session):
+        self.worker_id = worker_id
+        self.session = session
+        self.started = time.monotonic()
+        self.last_seen = time.monotonic()
+
+
+class TaskCoordinator:
+    """Serves claim/heartbeat/complete requests from remote scrape workers."""
+
+    def __init__(self, token: str, lease_seconds: int = DEFAULT_LEASE_SECONDS):
+        if not token:
+            raise ValueError("A coordinator token is required.")
+        self.token = token
+        self.lease_seconds = lease_seconds
+        self._server = None
+        self._sweeper = None
+        self._assignments = {}
+        self._clients = {}
+
+    @property
+    def is_running(self) -> bool:
+        return self._server is not None
+
+    async def start(self, host: str, port: int):
+        self._server = await asyncio.start_server(
+            self._handle_client, host, port, limit=MAX_MESSAGE_BYTES)
+        self._sweeper = asyncio.create_task(self._sweep_loop())
+        print(f"Task coordinator listening on {host}:{port}.")
+
+    async def stop(self):
+        if not self.is_running:
+            return
+        self._sweeper.cancel()
+        self._server.close()
+        # Closing the transports ends each client handler's read loop.
+        for writer in list(self._clients):
+            writer.close()
+        await asyncio.gather(*self._clients.values(), return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+        for assignment in self._assignments.values():
+            await session_pool.shared_session_pool.release(
+                assignment.session, session_pool.OUTCOME_ERROR, error="coordinator stopped")
+        self._assignments.clear()
+        print("Task coordinator stopped.")
+
+    async def _handle_client(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        self._clients[writer] = asyncio.current_task()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = await self._dispatch(json.loads(line))
+                except Exception as e:
+                    response = {"ok": False, "error": str(e)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            print(f"Lost connection to scrape worker {peer}: {e}")
+        finally:
+            self._clients.pop(writer, None)
+            writer.close()
+
+    async def _dispatch(self, message: dict) -> dict:
+        if not hmac.compare_digest(str(message.get("token", "")), self.token):
+            return {"ok": False, "error": "invalid token"}
+        op = message.get("op")
+        worker_id = str(message.get("worker_id", "unknown"))
+        if op == "claim":
+            return await self._claim(worker_id)
+        if op == "heartbeat":
+            return await self._heartbeat(worker_id, int(message["task_id"]))
+        if op == "complete":
+            return await self._complete(worker_id, int(message["task_id"]), message.get("result") or {})
+        return {"ok": False, "error": f"unknown op {op!r}"}
+
+    async def _claim(self, worker_id: str) -> dict:
+        # Raids whose auth sessions are all busy are skipped for the rest of
+        # this claim, so one busy raid does not hold up the others' tasks.
+        busy_raid_ids = set()
+        while True:
+            task = await async_database.claim_any_verification_task(
+                worker_id, self.lease_seconds, busy_raid_ids)
+            if task is None:
+                return {"ok": True, "task": None}
+            task_id, raid_id, url = task
+
+            participants = await async_database.get_raid_participants_with_handles(raid_id)
+            auth_files = await async_database.get_auth_files_for_users(
+                [p[0] for p in participants])
+            try:
+                session = await session_pool.shared_session_pool.acquire(
+                    auth_files, timeout=SESSION_ACQUIRE_TIMEOUT, wait_while_busy=False)
+                break
+            except session_pool.NoHealthySessionError:
+                await async_database.release_verification_task(task_id, worker_id)
+                busy_raid_ids.add(raid_id)
+
+        try:
+            storage_state = await session_pool.storage_state_cache.load(
+                session.auth_file)
+        except Exception as e:
+            await session_pool.shared_session_pool.release(
+                session, session_pool.OUTCOME_ERROR, error=str(e))
+            await async_database.release_verification_task(task_id, worker_id)
+            return {"ok": False, "error": "could not load an auth session"}
+
+        stale = self._assignments.pop(task_id, None)
+        if stale is not None:
+            # The previous worker's lease expired before the sweep noticed.
+            await session_pool.shared_session_pool.release(
+                stale.session, session_pool.OUTCOME_ERROR,
+                time.monotonic() - stale.started, "worker timed out")
+        self._assignments[task_id] = _Assignment(worker_id, session)
+        print(f"Assigned task {task_id} ({url}) to remote worker {worker_id}.")
+        return {"ok": True, "task": {
+            "task_id": task_id,
+            "raid_id": raid_id,
+            "url": url,
+            "target_handles": sorted(handle.lower() for _, handle in participants),
+            "storage_state": storage_state,
+            "lease_seconds": self.lease_seconds,
+        }}
+
+    async def _heartbeat(self, worker_id: str, task_id: int) -> dict:
+        assignment = self._assignments.get(task_id)
+        if assignment is not None and assignment.worker_id == worker_id:
+            assignment.last_seen = time.monotonic()
+        still_assigned = await async_database.extend_verification_lease(
+            task_id, worker_id, self.lease_seconds)
+        return {"ok": True, "still_assigned": still_assigned}
+
+    async def _complete(self, worker_id: str, task_id: int, result_data: dict) -> dict:
+        result = scraper.TweetScrapeResult.from_dict(result_data)
+        assignment = self._assignments.get(task_id)
+        if assignment is not None and assignment.worker_id == worker_id:
+            del self._assignments[task_id]
+            result.auth_file = assignment.session.auth_file
+            await session_pool.shared_session_pool.release(
+                assignment.session, scraper.session_outcome(result),
+                time.monotonic() - assignment.started, result.error)
+        # A late result from a worker whose lease expired is kept only while
+        # nobody else has taken the task over.
+        recorded = await async_database.run(
+            scraper.record_task_result, task_id, worker_id, result)
+        if not recorded:
+            print(f"Discarding a stale result for task {task_id} from remote worker {worker_id}.")
+        return {"ok": True, "recorded": recorded}
+
+    async def _sweep_loop(self):
+        """Frees the auth sessions of workers that stopped sending heartbeats."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 2)
+            cutoff = time.monotonic() - self.lease_seconds
+            for task_id, assignment in list(self._assignments.items()):
+                if assignment.last_seen < cutoff:
+                    print(
+                        f"Remote worker {assignment.worker_id} timed out on task {task_id}; it will be reassigned.")
+                    del self._assignments[task_id]
+                    await session_pool.shared_session_pool.release(
+                        assignment.session, session_pool.OUTCOME_ERROR,
+                        time.monotonic() - assignment.started, "worker timed out")
+
+
+# Created by the bot's post_init hook when COORDINATOR_PORT is set.
+shared_coordinator = None
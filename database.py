@@ -1,101 +1,327 @@
 # database.py (Updated for one link per user rule)
+import os
 import sqlite3
+import threading
 import time
+from config import env_int
+
+# A task is retried until it has been attempted this many times.
+MAX_VERIFICATION_ATTEMPTS = 3
 
 DATABASE_FILE = "bot_data.db"
 
-# --- CORE INITIALIZATION ---
+# Connection tuning. The page cache and memory map are per connection.
+DEFAULT_CACHE_SIZE_KB = 16384
+DEFAULT_MMAP_SIZE_MB = 64
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+CACHED_STATEMENTS = 256
 
+# --- CONNECTIONS ---
+# Each thread keeps one open connection per database file for its whole life,
+# so no call pays for opening a connection and prepared statements are reused.
 
-def initialize_database():
-    """Creates/updates the necessary tables for the bot."""
-    with sqlite3.connect(DATABASE_FILE) as conn:
-        cursor = conn.cursor()
+_local = threading.local()
 
-        # User table (unchanged)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                telegram_id INTEGER PRIMARY KEY,
-                x_handle TEXT UNIQUE,
-                auth_file_count INTEGER DEFAULT 0,
-                completed_raids INTEGER DEFAULT 0,
-                total_raids INTEGER DEFAULT 0
-            )
-        """)
 
-        # Raids Table (unchanged)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS raids (
-                raid_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                group_id INTEGER NOT NULL,
-                start_timestamp INTEGER NOT NULL,
-                submission_deadline_timestamp INTEGER NOT NULL, -- End of link collection
-                engagement_deadline_timestamp INTEGER NOT NULL, -- End of commenting (final deadline)
-                is_active BOOLEAN DEFAULT 1
-            )
-        """)
+def get_connection(db_file=None):
+    """
+    Returns this thread's long-lived connection to `db_file` (the bot database
+    by default). Use it as `with get_connection() as conn:`; the block commits
+    on success and rolls back on error, but the connection stays open.
+    """
+    db_file = db_file or DATABASE_FILE
+    connections = getattr(_local, "connections", None)
+    if connections is None or _local.pid != os.getpid():
+        connections = _local.connections = {}
+        _local.pid = os.getpid()
+    conn = connections.get(db_file)
+    if conn is None:
+        busy_timeout_ms = env_int("SQLITE_BUSY_TIMEOUT_MS", DEFAULT_BUSY_TIMEOUT_MS)
+        conn = sqlite3.connect(db_file, timeout=busy_timeout_ms / 1000,
+                               cached_statements=CACHED_STATEMENTS)
+        # WAL lets readers run while a write is in progress, and with
+        # synchronous=NORMAL a commit no longer waits for an fsync.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(
+            f"PRAGMA cache_size=-{env_int('SQLITE_CACHE_SIZE_KB', DEFAULT_CACHE_SIZE_KB)}")
+        conn.execute(
+            f"PRAGMA mmap_size={env_int('SQLITE_MMAP_SIZE_MB', DEFAULT_MMAP_SIZE_MB) * 1024 * 1024}")
+        conn.execute(f"PRAGMA busy_timeout={busy_timeout_ms}")
+        connections[db_file] = conn
+    return conn
+
+
+def close_connections():
+    """Closes this thread's connections (they are reopened on the next call)."""
+    for conn in getattr(_local, "connections", {}).values():
+        conn.close()
+    _local.connections = {}
+
+# --- IN-MEMORY CACHES ---
+# The link collector checks whether the sender is registered and whether the
+# group has an active raid for every group message with a link. The bot is the
+# only process that registers users and creates or ends raids, so both answers
+# are cached here and updated by those functions instead of expiring.
+
+# Every registered telegram_id; loaded on first use.
+_registered_users = None
+# group_id -> get_active_raid_details() result, including None for "no active raid".
+_active_raids = {}
+NOT_CACHED = object()
+
+
+def cached_user_registration(telegram_id):
+    """Returns is_user_registered() from the cache, or None before it is loaded."""
+    if _registered_users is None:
+        return None
+    return telegram_id in _registered_users
+
+
+def cached_active_raid_details(group_id):
+    """Returns get_active_raid_details() from the cache, or NOT_CACHED."""
+    return _active_raids.get(group_id, NOT_CACHED)
+
+
+def clear_caches():
+    """Forgets the cached answers, e.g. after the database was edited by hand."""
+    global _registered_users
+    _registered_users = None
+    _active_raids.clear()
+
+# --- SCHEMA MIGRATIONS ---
+# Every schema change is a migration that runs once, in order, in its own
+# transaction; the versions applied are recorded in schema_version. Append new
+# migrations to MIGRATIONS and never edit one that has shipped.
+
+
+def _migration_1_base_tables(cursor):
+    """The tables as they existed before migrations were versioned."""
+    # User table (unchanged)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            telegram_id INTEGER PRIMARY KEY,
+            x_handle TEXT UNIQUE,
+            auth_file_count INTEGER DEFAULT 0,
+            completed_raids INTEGER DEFAULT 0,
+            total_raids INTEGER DEFAULT 0
+        )
+    """)
+
+    # Raids Table (unchanged)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS raids (
+            raid_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            group_id INTEGER NOT NULL,
+            start_timestamp INTEGER NOT NULL,
+            submission_deadline_timestamp INTEGER NOT NULL, -- End of link collection
+            engagement_deadline_timestamp INTEGER NOT NULL, -- End of commenting (final deadline)
+            is_active BOOLEAN DEFAULT 1
+        )
+    """)
+
+    # Raid Links Table (unchanged)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS raid_links (
+            link_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            raid_id INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            UNIQUE(raid_id, url)
+        )
+    """)
+
+    # --- UPDATED: Raid Participants Table ---
+    # Added has_submitted_link to track submissions
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS raid_participants (
+            participation_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            raid_id INTEGER NOT NULL,
+            telegram_id INTEGER NOT NULL,
+            links_commented INTEGER DEFAULT 0,
+            has_submitted_link INTEGER DEFAULT 0, -- 0 for no, 1 for yes
+            UNIQUE(raid_id, telegram_id)
+        )
+    """)
+
+    # User Groups Table (unchanged)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_groups (
+            user_group_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            telegram_id INTEGER NOT NULL,
+            group_id INTEGER NOT NULL,
+            group_name TEXT NOT NULL,
+            UNIQUE(telegram_id, group_id)
+        )
+    """)
+
+    # Auth Files Table: every uploaded storage-state file, recorded at upload time
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS auth_files (
+            auth_file_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            telegram_id INTEGER NOT NULL,
+            file_path TEXT NOT NULL UNIQUE,
+            created_timestamp INTEGER NOT NULL
+        )
+    """)
+
+    # Verification Jobs Table: one row per raid whose verification was started
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS verification_jobs (
+            raid_id INTEGER PRIMARY KEY,
+            chat_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'running', -- running, done
+            created_timestamp INTEGER NOT NULL,
+            completed_timestamp INTEGER
+        )
+    """)
+
+    # Verification Tasks Table: one row per (raid, URL) with its checkpointed result
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS verification_tasks (
+            task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            raid_id INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending', -- pending, running, done, failed
+            attempts INTEGER DEFAULT 0,
+            worker_id TEXT,
+            lease_expires_timestamp INTEGER,
+            result TEXT, -- JSON, written as soon as the URL finishes
+            updated_timestamp INTEGER,
+            UNIQUE(raid_id, url)
+        )
+    """)
+
+
+def _migration_2_lookup_indexes(cursor):
+    """Indexes for the lookups that scanned whole tables."""
+    # Active raids of a group (link collector, /ongoing_raid, /start_raid).
+    # Ended raids are never looked up this way, so they are left out of the index.
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_raids_active_group
+        ON raids (group_id) WHERE is_active = 1
+    """)
+    # Auth files of a raid's participants.
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_auth_files_telegram_id
+        ON auth_files (telegram_id, auth_file_id)
+    """)
+    # Claiming the next task across every raid (remote workers).
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_verification_tasks_status
+        ON verification_tasks (status, task_id)
+    """)
+    # user_groups (telegram_id), raid_participants (raid_id) and
+    # verification_tasks (raid_id) lookups already use their UNIQUE indexes.
+    cursor.execute("ANALYZE")
+
+
+def _migration_3_auth_session_leases(cursor):
+    """Auth session leases and cooldowns shared by every scraper process."""
+    # One row per page currently using an auth session, in any process.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS auth_session_leases (
+            lease_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            auth_file TEXT NOT NULL,
+            holder TEXT NOT NULL, -- host:pid of the process using it
+            expires_timestamp REAL NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_auth_session_leases_auth_file
+        ON auth_session_leases (auth_file)
+    """)
+    # Sessions that were rate-limited or kept failing, until when they rest.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS auth_session_cooldowns (
+            auth_file TEXT PRIMARY KEY,
+            cooldown_until REAL NOT NULL
+        )
+    """)
 
-        # Raid Links Table (unchanged)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS raid_links (
-                link_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                raid_id INTEGER NOT NULL,
-                url TEXT NOT NULL,
-                UNIQUE(raid_id, url)
-            )
-        """)
 
-        # --- UPDATED: Raid Participants Table ---
-        # Added has_submitted_link to track submissions
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS raid_participants (
-                participation_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                raid_id INTEGER NOT NULL,
-                telegram_id INTEGER NOT NULL,
-                links_commented INTEGER DEFAULT 0,
-                has_submitted_link INTEGER DEFAULT 0, -- 0 for no, 1 for yes
-                UNIQUE(raid_id, telegram_id)
-            )
-        """)
+MIGRATIONS = [
+    (1, _migration_1_base_tables),
+    (2, _migration_2_lookup_indexes),
+    (3, _migration_3_auth_session_leases),
+]
 
-        # User Groups Table (unchanged)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_groups (
-                user_group_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                telegram_id INTEGER NOT NULL,
-                group_id INTEGER NOT NULL,
-                group_name TEXT NOT NULL,
-                UNIQUE(telegram_id, group_id)
-            )
-        """)
 
-    print("Database initialized successfully with all tables.")
+def get_schema_version(conn=None):
+    """Returns the highest migration applied to the database (0 for a new one)."""
+    conn = conn or get_connection()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            applied_timestamp INTEGER NOT NULL
+        )
+    """)
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def migrate_database():
+    """Applies every pending migration. Returns the number applied."""
+    conn = get_connection()
+    get_schema_version(conn)
+    conn.commit()
+    applied = 0
+    for version, migration in MIGRATIONS:
+        cursor = conn.cursor()
+        # IMMEDIATE holds the write lock from the version check to the commit,
+        # so two processes starting at once cannot both apply a migration.
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            if get_schema_version(conn) < version:
+                migration(cursor)
+                cursor.execute(
+                    "INSERT INTO schema_version (version, applied_timestamp) VALUES (?, ?)",
+                    (version, int(time.time())))
+                applied += 1
+                print(f"Applied database migration {version}: {migration.__doc__}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return applied
+
+
+# --- CORE INITIALIZATION ---
+
+
+def initialize_database():
+    """Creates the tables and brings the schema up to date."""
+    migrate_database()
+    print(f"Database initialized successfully (schema version {get_schema_version()}).")
 
 
 # --- USER PROFILE FUNCTIONS ---
 
 def is_user_registered(telegram_id):
     """Checks if a user exists in the users table. Returns True or False."""
-    with sqlite3.connect(DATABASE_FILE) as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT 1 FROM users WHERE telegram_id = ?", (telegram_id,))
-        return cursor.fetchone() is not None
+    global _registered_users
+    if _registered_users is None:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT telegram_id FROM users")
+            _registered_users = {row[0] for row in cursor.fetchall()}
+    return telegram_id in _registered_users
 
 # (connect_user_profile, get_user_profile, update_auth_file_count, etc. are unchanged)
 
 
 def connect_user_profile(telegram_id, x_handle):
-    with sqlite3.connect(DATABASE_FILE) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             INSERT INTO users (telegram_id, x_handle) VALUES (?, ?)
             ON CONFLICT(telegram_id) DO UPDATE SET x_handle=excluded.x_handle
         """, (telegram_id, x_handle))
+    if _registered_users is not None:
+        _registered_users.add(telegram_id)
 
 
 def get_user_profile(telegram_id):
-    with sqlite3.connect(DATABASE_FILE) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "SELECT x_handle, auth_file_count, completed_raids, total_raids FROM users WHERE telegram_id = ?", (telegram_id,))
@@ -103,14 +329,63 @@ def get_user_profile(telegram_id):
 
 
 def update_auth_file_count(telegram_id, count):
-    with sqlite3.connect(DATABASE_FILE) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "UPDATE users SET auth_file_count = ? WHERE telegram_id = ?", (count, telegram_id))
 
 
+def add_auth_file(telegram_id, file_path):
+    """Records an uploaded auth file so the scraper never has to scan user_data/."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT OR IGNORE INTO auth_files (telegram_id, file_path, created_timestamp) VALUES (?, ?, ?)",
+            (telegram_id, file_path, int(time.time()))
+        )
+
+
+def get_auth_files_for_users(telegram_ids):
+    """Returns the paths of every registered auth file belonging to the given users."""
+    telegram_ids = list(telegram_ids)
+    if not telegram_ids:
+        return []
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        placeholders = ",".join("?" * len(telegram_ids))
+        cursor.execute(
+            f"SELECT file_path FROM auth_files WHERE telegram_id IN ({placeholders}) ORDER BY auth_file_id",
+            telegram_ids
+        )
+        return [item[0] for item in cursor.fetchall()]
+
+
+def register_existing_auth_files(root_dir="user_data"):
+    """
+    One-time backfill for auth files uploaded before the auth_files table existed.
+    Returns the number of files that were newly registered.
+    """
+    if not os.path.isdir(root_dir):
+        return 0
+    rows = []
+    for user_dir in os.listdir(root_dir):
+        user_path = os.path.join(root_dir, user_dir)
+        if not user_dir.isdigit() or not os.path.isdir(user_path):
+            continue
+        for file_name in os.listdir(user_path):
+            if file_name.endswith('.json'):
+                rows.append((int(user_dir), os.path.join(user_path, file_name),
+                             int(time.time())))
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        before = conn.total_changes
+        cursor.executemany(
+            "INSERT OR IGNORE INTO auth_files (telegram_id, file_path, created_timestamp) VALUES (?, ?, ?)", rows)
+        return conn.total_changes - before
+
+
 def add_user_to_group(telegram_id, group_id, group_name):
-    with sqlite3.connect(DATABASE_FILE) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             INSERT OR IGNORE INTO user_groups (telegram_id, group_id, group_name)
@@ -123,7 +398,7 @@ def get_raid_participants_with_handles(raid_id):
     Retrieves the telegram_id and x_handle of all participants for a specific raid.
     Returns a list of tuples: [(telegram_id, x_handle), ...]
     """
-    with sqlite3.connect(DATABASE_FILE) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         # This query joins the users and raid_participants tables to get the required info
         cursor.execute("""
@@ -136,7 +411,7 @@ def get_raid_participants_with_handles(raid_id):
 
 
 def get_groups_for_user(telegram_id):
-    with sqlite3.connect(DATABASE_FILE) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "SELECT group_name FROM user_groups WHERE telegram_id = ?", (
@@ -152,7 +427,7 @@ def add_raid_link_and_mark_submitted(raid_id, telegram_id, url):
     Atomically checks if a user has submitted, and if not, adds their link and marks them as submitted.
     Returns True on success, False if they had already submitted.
     """
-    with sqlite3.connect(DATABASE_FILE) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         # First, check if the user has already submitted a link for this raid.
         cursor.execute(
@@ -179,7 +454,7 @@ def add_raid_link_and_mark_submitted(raid_id, telegram_id, url):
 # (create_new_raid, get_active_raid_id, etc. are unchanged)
 def create_new_raid(group_id, submission_deadline_timestamp, engagement_deadline_timestamp):
     """Creates a new raid with the two distinct deadlines."""
-    with sqlite3.connect(DATABASE_FILE) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         current_time = int(time.time())
         cursor.execute(
@@ -187,16 +462,14 @@ def create_new_raid(group_id, submission_deadline_timestamp, engagement_deadline
             (group_id, current_time, submission_deadline_timestamp,
              engagement_deadline_timestamp)
         )
-        return cursor.lastrowid
+        raid_id = cursor.lastrowid
+    _active_raids.pop(group_id, None)
+    return raid_id
 
 
 def get_active_raid_id(group_id):
-    with sqlite3.connect(DATABASE_FILE) as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT raid_id FROM raids WHERE group_id = ? AND is_active = 1", (group_id,))
-        raid_data = cursor.fetchone()
-        return raid_data[0] if raid_data else None
+    raid_data = get_active_raid_details(group_id)
+    return raid_data[0] if raid_data else None
 
 
 def get_active_raid_details(group_id):
@@ -204,26 +477,360 @@ def get_active_raid_details(group_id):
     Checks for an active raid and returns its ID and both deadlines.
     Returns: (raid_id, submission_deadline_ts, engagement_deadline_ts) or None.
     """
-    with sqlite3.connect(DATABASE_FILE) as conn:
+    raid_details = _active_raids.get(group_id, NOT_CACHED)
+    if raid_details is not NOT_CACHED:
+        return raid_details
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "SELECT raid_id, submission_deadline_timestamp, engagement_deadline_timestamp FROM raids WHERE group_id = ? AND is_active = 1",
             (group_id,)
         )
-        return cursor.fetchone()
+        raid_details = cursor.fetchone()
+    _active_raids[group_id] = raid_details
+    return raid_details
 
 
 def deactivate_raid(raid_id):
-    with sqlite3.connect(DATABASE_FILE) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "UPDATE raids SET is_active = 0 WHERE raid_id = ?", (raid_id,))
+    for group_id, raid_details in list(_active_raids.items()):
+        if raid_details and raid_details[0] == raid_id:
+            del _active_raids[group_id]
 
 
 def get_links_for_raid(raid_id):
-    with sqlite3.connect(DATABASE_FILE) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "SELECT url FROM raid_links WHERE raid_id = ?", (raid_id,)
         )
         return [item[0] for item in cursor.fetchall()]
+
+
+def get_active_raids():
+    """Returns (raid_id, group_id, engagement_deadline_timestamp) for every active raid."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT raid_id, group_id, engagement_deadline_timestamp FROM raids WHERE is_active = 1")
+        return cursor.fetchall()
+
+
+# --- VERIFICATION QUEUE FUNCTIONS ---
+
+
+def create_verification_job(raid_id, chat_id, urls):
+    """
+    Creates the verification job for a raid with one pending task per URL.
+    If the job already exists (e.g. after a restart) nothing is changed.
+    Returns the URLs of the job's tasks.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT OR IGNORE INTO verification_jobs (raid_id, chat_id, created_timestamp) VALUES (?, ?, ?)",
+            (raid_id, chat_id, int(time.time()))
+        )
+        if cursor.rowcount:
+            cursor.executemany(
+                "INSERT OR IGNORE INTO verification_tasks (raid_id, url) VALUES (?, ?)",
+                [(raid_id, url) for url in urls]
+            )
+        cursor.execute(
+            "SELECT url FROM verification_tasks WHERE raid_id = ? ORDER BY task_id", (raid_id,))
+        return [item[0] for item in cursor.fetchall()]
+
+
+def _fail_exhausted_tasks(cursor, where_sql, params, now):
+    """
+    Closes tasks whose lease expired on their last attempt. They can never be
+    claimed again, so they would otherwise stay 'running' forever.
+    """
+    cursor.execute(f"""
+        UPDATE verification_tasks
+        SET status = 'failed', lease_expires_timestamp = NULL, updated_timestamp = ?
+        WHERE {where_sql} attempts >= ? AND status = 'running' AND lease_expires_timestamp < ?
+    """, (now, *params, MAX_VERIFICATION_ATTEMPTS, now))
+    return cursor.rowcount
+
+
+def _claim_task(cursor, where_sql, params, worker_id, lease_seconds):
+    """Selects and leases one claimable task inside an open IMMEDIATE transaction."""
+    now = int(time.time())
+    _fail_exhausted_tasks(cursor, where_sql, params, now)
+    cursor.execute(f"""
+        SELECT task_id, raid_id, url FROM verification_tasks
+        WHERE {where_sql} attempts < ?
+          AND (status = 'pending' OR (status = 'running' AND lease_expires_timestamp < ?))
+        ORDER BY task_id LIMIT 1
+    """, (*params, MAX_VERIFICATION_ATTEMPTS, now))
+    task = cursor.fetchone()
+    if task:
+        cursor.execute("""
+            UPDATE verification_tasks
+            SET status = 'running', attempts = attempts + 1, worker_id = ?,
+                lease_expires_timestamp = ?, updated_timestamp = ?
+            WHERE task_id = ?
+        """, (worker_id, now + lease_seconds, now, task[0]))
+    return task
+
+
+def _claim_atomically(where_sql, params, worker_id, lease_seconds):
+    conn = get_connection()
+    cursor = conn.cursor()
+    # IMMEDIATE takes the write lock up front so two workers never claim the same row.
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        task = _claim_task(cursor, where_sql, params,
+                           worker_id, lease_seconds)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return task
+
+
+def claim_verification_task(raid_id, worker_id, lease_seconds=600):
+    """
+    Atomically claims the next pending task of a raid (or one whose lease has
+    expired) for `worker_id`. Returns (task_id, url) or None if nothing is left.
+    """
+    task = _claim_atomically(
+        "raid_id = ? AND", (raid_id,), worker_id, lease_seconds)
+    return (task[0], task[2]) if task else None
+
+
+def claim_any_verification_task(worker_id, lease_seconds=90, skip_raid_ids=()):
+    """
+    Like claim_verification_task, but across every raid except `skip_raid_ids`.
+    Used by the coordinator for remote workers. Returns (task_id, raid_id, url) or None.
+    """
+    skip_raid_ids = list(skip_raid_ids)
+    if not skip_raid_ids:
+        return _claim_atomically("", (), worker_id, lease_seconds)
+    placeholders = ",".join("?" * len(skip_raid_ids))
+    return _claim_atomically(f"raid_id NOT IN ({placeholders}) AND", skip_raid_ids,
+                             worker_id, lease_seconds)
+
+
+def extend_verification_lease(task_id, worker_id, lease_seconds=90):
+    """Heartbeat: pushes back the lease of a running task. Returns False if it was reassigned."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE verification_tasks SET lease_expires_timestamp = ?
+            WHERE task_id = ? AND worker_id = ? AND status = 'running'
+        """, (int(time.time()) + lease_seconds, task_id, worker_id))
+        return cursor.rowcount > 0
+
+
+def release_verification_task(task_id, worker_id):
+    """
+    Hands a claimed task back without counting the attempt (e.g. no auth session
+    was free). Returns False if the task is no longer leased to `worker_id`.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE verification_tasks
+            SET status = 'pending', attempts = MAX(attempts - 1, 0), lease_expires_timestamp = NULL
+            WHERE task_id = ? AND status = 'running' AND worker_id = ?
+        """, (task_id, worker_id))
+        return cursor.rowcount > 0
+
+
+def complete_verification_task(task_id, worker_id, result_json):
+    """
+    Checkpoints the result of a finished URL. Returns False, and changes
+    nothing, if the task is no longer leased to `worker_id`.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE verification_tasks
+            SET status = 'done', result = ?, lease_expires_timestamp = NULL, updated_timestamp = ?
+            WHERE task_id = ? AND status = 'running' AND worker_id = ?
+        """, (result_json, int(time.time()), task_id, worker_id))
+        return cursor.rowcount > 0
+
+
+def fail_verification_task(task_id, worker_id, result_json):
+    """
+    Records a failed attempt. The task goes back to 'pending' for another try,
+    or becomes 'failed' (keeping the last result) once it is out of attempts.
+    Returns False, and changes nothing, if the task is no longer leased to `worker_id`.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE verification_tasks
+            SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                result = ?, lease_expires_timestamp = NULL, updated_timestamp = ?
+            WHERE task_id = ? AND status = 'running' AND worker_id = ?
+        """, (MAX_VERIFICATION_ATTEMPTS, result_json, int(time.time()), task_id, worker_id))
+        return cursor.rowcount > 0
+
+
+def release_running_verification_tasks():
+    """
+    Puts tasks left 'running' by a crashed process back in the queue.
+    Called at startup, when no local worker can still be holding them.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE verification_tasks
+            SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                lease_expires_timestamp = NULL, updated_timestamp = ?
+            WHERE status = 'running'
+        """, (MAX_VERIFICATION_ATTEMPTS, int(time.time())))
+        return cursor.rowcount
+
+
+def fail_exhausted_verification_tasks(raid_id):
+    """
+    Marks a raid's tasks 'failed' when their lease expired on the last attempt.
+    Called while waiting on a raid, since no worker may be left to claim them.
+    Returns the number of tasks closed.
+    """
+    with get_connection() as conn:
+        return _fail_exhausted_tasks(conn.cursor(), "raid_id = ? AND", (raid_id,), int(time.time()))
+
+
+def fail_open_verification_tasks(raid_id):
+    """Gives up on every task of a raid that is still pending or running. Returns how many."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE verification_tasks
+            SET status = 'failed', lease_expires_timestamp = NULL, updated_timestamp = ?
+            WHERE raid_id = ? AND status IN ('pending', 'running')
+        """, (int(time.time()), raid_id))
+        return cursor.rowcount
+
+
+def count_open_verification_tasks(raid_id):
+    """Returns how many tasks of a raid are still pending or running."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT COUNT(*) FROM verification_tasks WHERE raid_id = ? AND status IN ('pending', 'running')",
+            (raid_id,)
+        )
+        return cursor.fetchone()[0]
+
+
+def get_verification_task_results(raid_id):
+    """Returns [(url, status, result_json), ...] for every task of a raid."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT url, status, result FROM verification_tasks WHERE raid_id = ? ORDER BY task_id",
+            (raid_id,)
+        )
+        return cursor.fetchall()
+
+
+def get_finished_verification_tasks(raid_id, since_timestamp=0):
+    """
+    Returns [(task_id, updated_timestamp, url, status, result_json), ...] for
+    the tasks of a raid that were closed at or after `since_timestamp`.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT task_id, updated_timestamp, url, status, result FROM verification_tasks
+            WHERE raid_id = ? AND status IN ('done', 'failed') AND updated_timestamp >= ?
+        """, (raid_id, since_timestamp))
+        return cursor.fetchall()
+
+
+def finish_verification_job(raid_id):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE verification_jobs SET status = 'done', completed_timestamp = ? WHERE raid_id = ?",
+            (int(time.time()), raid_id)
+        )
+
+
+# --- AUTH SESSION LEASES ---
+# The scraper processes share their auth sessions through these tables, so the
+# per-session page limit and cooldowns hold across all of them.
+
+
+def try_lease_auth_session(auth_file, holder, limit, lease_seconds):
+    """
+    Leases `auth_file` for one page if fewer than `limit` pages use it and it
+    is not cooling down. Returns the lease ID, or None if it is unavailable.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    # IMMEDIATE so two processes never both take the last free slot.
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        now = time.time()
+        # Leases of a process that died without releasing them run out.
+        cursor.execute(
+            "DELETE FROM auth_session_leases WHERE expires_timestamp < ?", (now,))
+        cursor.execute(
+            "SELECT 1 FROM auth_session_cooldowns WHERE auth_file = ? AND cooldown_until > ?",
+            (auth_file, now))
+        cooling_down = cursor.fetchone() is not None
+        cursor.execute(
+            "SELECT COUNT(*) FROM auth_session_leases WHERE auth_file = ?", (auth_file,))
+        lease_id = None
+        if not cooling_down and cursor.fetchone()[0] < limit:
+            cursor.execute(
+                "INSERT INTO auth_session_leases (auth_file, holder, expires_timestamp) VALUES (?, ?, ?)",
+                (auth_file, holder, now + lease_seconds))
+            lease_id = cursor.lastrowid
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return lease_id
+
+
+def release_auth_session_lease(lease_id):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "DELETE FROM auth_session_leases WHERE lease_id = ?", (lease_id,))
+
+
+def release_all_auth_session_leases():
+    """Drops every lease. Called at startup, before any scraper process runs."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM auth_session_leases")
+        return cursor.rowcount
+
+
+def set_auth_session_cooldown(auth_file, cooldown_until):
+    """Rests a session in every process until `cooldown_until` (a Unix time)."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO auth_session_cooldowns (auth_file, cooldown_until) VALUES (?, ?)
+            ON CONFLICT(auth_file) DO UPDATE SET
+                cooldown_until = MAX(auth_session_cooldowns.cooldown_until, excluded.cooldown_until)
+        """, (auth_file, cooldown_until))
+
+
+def get_auth_session_cooldowns(auth_files):
+    """Returns {auth_file: cooldown_until} for the given files that are cooling down."""
+    auth_files = list(auth_files)
+    if not auth_files:
+        return {}
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        placeholders = ",".join("?" * len(auth_files))
+        cursor.execute(
+            f"SELECT auth_file, cooldown_until FROM auth_session_cooldowns "
+            f"WHERE cooldown_until > ? AND auth_file IN ({placeholders})",
+            [time.time(), *auth_files])
+        return dict(cursor.fetchall())
@@ -0,0 +1,141 @@
+# http_backend.py
+# Requests X's TweetDetail GraphQL endpoint directly with the cookies from an
+# uploaded storage state, so reply authors can be read without a browser.
+# The endpoint can be pointed at a local stand-in (see benchmarks/fixture_server.py)
+# with X_API_BASE_URL.
+import json
+import os
+import httpx
+from config import env_float
+
+DEFAULT_API_BASE_URL = "https://x.com"
+# X rotates the TweetDetail query ID with web-app releases; override it with
+# TWEETDETAIL_QUERY_ID when requests start failing with HTTP 400/404.
+DEFAULT_TWEET_DETAIL_QUERY_ID = "nBS-WpgA6ZG0CyNHD517JQ"
+# The public bearer token of X's web app (not a secret; the same for every user).
+DEFAULT_BEARER_TOKEN = ("AAAAAAAAAAAAAAAAAAAAANRILgAAAAAAnNwIzUejRCOuH5E6I8xnZz4puTs%3D"
+                        "1Zv7ttfk8LF81IUq16cHjhLTvJu4FA33AGWWjCpTnA")
+DEFAULT_HTTP_TIMEOUT = 20.0
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36")
+
+BASE_VARIABLES = {
+    "with_rux_injections": False,
+    "rankingMode": "Recency",
+    "includePromotedContent": False,
+    "withCommunity": True,
+    "withQuickPromoteEligibilityTweetFields": False,
+    "withBirdwatchNotes": False,
+    "withVoice": False,
+}
+# Feature flags the endpoint insists on. TWEETDETAIL_FEATURES (a JSON object)
+# is merged over them when X adds new required flags.
+BASE_FEATURES = {
+    "rweb_tipjar_consumption_enabled": True,
+    "responsive_web_graphql_exclude_directive_enabled": True,
+    "verified_phone_label_enabled": False,
+    "creator_subscriptions_tweet_preview_api_enabled": True,
+    "responsive_web_graphql_timeline_navigation_enabled": True,
+    "responsive_web_graphql_skip_user_profile_image_extensions_enabled": False,
+    "communities_web_enable_tweet_community_results_fetch": True,
+    "c9s_tweet_anatomy_moderator_badge_enabled": True,
+    "articles_preview_enabled": True,
+    "tweetypie_unmention_optimization_enabled": True,
+    "responsive_web_edit_tweet_api_enabled": True,
+    "graphql_is_translatable_rweb_tweet_is_translatable_enabled": True,
+    "view_counts_everywhere_api_enabled": True,
+    "longform_notetweets_consumption_enabled": True,
+    "responsive_web_twitter_article_tweet_consumption_enabled": True,
+    "tweet_awards_web_tipping_enabled": False,
+    "creator_subscriptions_quote_tweet_preview_enabled": False,
+    "freedom_of_speech_not_reach_fetch_enabled": True,
+    "standardized_nudges_misinfo": True,
+    "tweet_with_visibility_results_prefer_gql_limited_actions_policy_enabled": True,
+    "rweb_video_timestamps_enabled": True,
+    "longform_notetweets_rich_text_read_enabled": True,
+    "longform_notetweets_inline_media_enabled": True,
+    "responsive_web_enhance_cards_enabled": False,
+}
+COOKIE_DOMAINS = ("x.com", "twitter.com")
+
+
+class RateLimitedError(Exception):
+    """Raised when X answers a TweetDetail request with HTTP 429."""
+
+
+def cookies_from_storage_state(storage_state) -> dict:
+    """Returns the X cookies of a storage state (a parsed dict or a file path)."""
+    if isinstance(storage_state, str):
+        with open(storage_state, 'r', encoding='utf-8') as f:
+            storage_state = json.load(f)
+    cookies = {}
+    for cookie in (storage_state or {}).get("cookies", []):
+        domain = cookie.get("domain", "").lstrip(".")
+        if any(domain == d or domain.endswith("." + d) for d in COOKIE_DOMAINS):
+            cookies[cookie["name"]] = cookie["value"]
+    return cookies
+
+
+def _features() -> dict:
+    features = dict(BASE_FEATURES)
+    override = os.getenv("TWEETDETAIL_FEATURES")
+    if override:
+        try:
+            features.update(json.loads(override))
+        except ValueError:
+            print("Invalid JSON in TWEETDETAIL_FEATURES; using the default features.")
+    return features
+
+
+class TweetDetailClient:
+    """
+    An authenticated TweetDetail client for one storage state. Use it as an
+    async context manager so its connections are closed afterwards.
+    """
+
+    def __init__(self, storage_state, base_url: str = None, query_id: str = None,
+                 timeout: float = None):
+        cookies = cookies_from_storage_state(storage_state)
+        if "ct0" not in cookies or "auth_token" not in cookies:
+            raise ValueError("The storage state has no logged-in X session (ct0/auth_token missing).")
+        self.base_url = (base_url or os.getenv("X_API_BASE_URL", DEFAULT_API_BASE_URL)).rstrip("/")
+        self.query_id = query_id or os.getenv("TWEETDETAIL_QUERY_ID", DEFAULT_TWEET_DETAIL_QUERY_ID)
+        if timeout is None:
+            timeout = env_float("HTTP_SCRAPE_TIMEOUT", DEFAULT_HTTP_TIMEOUT)
+        self._features = json.dumps(_features(), separators=(",", ":"))
+        self._client = httpx.AsyncClient(
+            cookies=cookies,
+            timeout=timeout,
+            headers={
+                "authorization": f"Bearer {os.getenv('X_BEARER_TOKEN', DEFAULT_BEARER_TOKEN)}",
+                "x-csrf-token": cookies["ct0"],
+                "x-twitter-auth-type": "OAuth2Session",
+                "x-twitter-active-user": "yes",
+                "user-agent": USER_AGENT,
+                "referer": f"{self.base_url}/",
+            },
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self._client.aclose()
+
+    async def fetch(self, tweet_id: str, cursor: str = None) -> dict:
+        """Returns one TweetDetail payload: the first page, or the one after `cursor`."""
+        variables = dict(BASE_VARIABLES, focalTweetId=tweet_id)
+        if cursor:
+            variables["cursor"] = cursor
+        response = await self._client.get(
+            f"{self.base_url}/i/api/graphql/{self.query_id}/TweetDetail",
+            params={"variables": json.dumps(variables, separators=(",", ":")),
+                    "features": self._features},
+        )
+        if response.status_code == 429:
+            raise RateLimitedError("TweetDetail request was rate-limited (HTTP 429).")
+        response.raise_for_status()
+        return response.json()
@@ -0,0 +1,87 @@
+# lean_mode.py
+# A "lean" page profile for scraping: only what is needed to render replies is
+# loaded. Images, video, fonts, beacons and third-party trackers are aborted.
+from collections import Counter
+from urllib.parse import urlparse
+
+# Resource types that never carry reply data.
+BLOCKED_RESOURCE_TYPES = ("image", "media", "font", "ping", "texttrack",
+                          "manifest", "cspviolationreport")
+
+# First-party hosts X needs to render a tweet and its replies.
+ALLOWED_HOST_SUFFIXES = ("x.com", "twitter.com", "twimg.com")
+
+# First-party endpoints that are pure telemetry/ads and safe to drop.
+BLOCKED_PATH_MARKERS = ("/jot/", "/client_event", "/attribution/",
+                        "/promoted_content/", "/live_pipeline/", "/ads/")
+
+# Rough average transfer size per blocked resource type, used to estimate the
+# bandwidth saved (an aborted request never reports its real size).
+ESTIMATED_BYTES_BY_TYPE = {
+    "image": 30_000,
+    "media": 400_000,
+    "font": 45_000,
+}
+DEFAULT_ESTIMATED_BYTES = 2_000
+
+
+class LeanModeStats:
+    """Counters for requests blocked and allowed by lean mode."""
+
+    def __init__(self):
+        self.requests_blocked = 0
+        self.requests_allowed = 0
+        self.bytes_saved_estimate = 0
+        self.blocked_by_type = Counter()
+
+    def record_blocked(self, resource_type: str):
+        self.requests_blocked += 1
+        self.blocked_by_type[resource_type] += 1
+        self.bytes_saved_estimate += ESTIMATED_BYTES_BY_TYPE.get(
+            resource_type, DEFAULT_ESTIMATED_BYTES)
+
+    def summary(self) -> str:
+        return (f"{self.requests_blocked} blocked / {self.requests_allowed} allowed, "
+                f"~{self.bytes_saved_estimate / 1_000_000:.1f} MB saved")
+
+
+def _is_allowed_host(host: str, extra_hosts) -> bool:
+    if host in extra_hosts:
+        return True
+    return any(host == suffix or host.endswith("." + suffix)
+               for suffix in ALLOWED_HOST_SUFFIXES)
+
+
+def should_block(url: str, resource_type: str, extra_hosts=()) -> bool:
+    """Decides whether a request is unnecessary for reading replies."""
+    if resource_type in BLOCKED_RESOURCE_TYPES:
+        return True
+    parsed = urlparse(url)
+    if parsed.scheme in ("data", "blob"):
+        return False
+    if not _is_allowed_host(parsed.hostname or "", extra_hosts):
+        return True
+    return any(marker in parsed.path for marker in BLOCKED_PATH_MARKERS)
+
+
+async def enable_lean_mode(context, stats: LeanModeStats = None, extra_hosts=()) -> LeanModeStats:
+    """
+    Installs a route on the context that aborts unneeded requests. `extra_hosts`
+    are additionally allowed (e.g. a local fixture server). Returns the stats
+    object that is updated as the context loads pages.
+    """
+    if stats is None:
+        stats = LeanModeStats()
+    extra_hosts = tuple(extra_hosts)
+
+    async def handle_route(route):
+        request = route.request
+        if should_block(request.url, request.resource_type, extra_hosts):
+            stats.record_blocked(request.resource_type)
+            await route.abort()
+        else:
+            stats.requests_allowed += 1
+            await route.continue_()
+
+    await context.route("**/*", handle_route)
+    return stats
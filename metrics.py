@@ -0,0 +1,188 @@
+# metrics.py
+# Scraper metrics in the Prometheus text format, served on a local HTTP port
+# (METRICS_PORT), plus one structured JSON log line per scraped tweet.
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the phase latency histogram buckets.
+PHASE_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set."""
+
+    def __init__(self, name: str, help_text: str, buckets=PHASE_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self._series.setdefault(
+            key, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series["buckets"][index] += 1
+        series["sum"] += value
+        series["count"] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            for bound, count in zip(self.buckets, series["buckets"]):
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(labels + (('le', f'{bound:g}'),))} {count}")
+            lines.append(
+                f"{self.name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {series['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {series['sum']:g}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {series['count']}")
+        return lines
+
+
+pages_scraped = Counter(
+    "scraper_pages_total", "Tweet pages scraped, by handle source and stop reason.")
+phase_seconds = Histogram(
+    "scraper_phase_seconds", "Time spent per scrape phase.")
+handles_found = Counter(
+    "scraper_handles_found_total", "Reply handles extracted.")
+reveal_clicks = Counter(
+    "scraper_reveal_clicks_total", "'Show more replies' and 'Show probable spam' clicks.")
+timeouts = Counter(
+    "scraper_timeouts_total", "Page loads and reply waits that ran into their timeout.")
+idle_rounds = Counter(
+    "scraper_idle_scroll_rounds_total", "Scroll rounds that loaded nothing new.")
+scrape_errors = Counter(
+    "scraper_errors_total", "Scrapes that ended in an error.")
+lean_requests_blocked = Counter(
+    "scraper_lean_requests_blocked_total", "Requests aborted by lean mode, by resource type.")
+lean_bytes_saved = Counter(
+    "scraper_lean_bytes_saved_total", "Estimated bytes lean mode kept from being downloaded.")
+auth_file_pages = Counter(
+    "scraper_auth_file_pages_total", "Pages scraped per auth file, by session outcome.")
+auth_file_seconds = Counter(
+    "scraper_auth_file_seconds_total", "Total scrape time per auth file.")
+
+REGISTRY = (pages_scraped, phase_seconds, handles_found, reveal_clicks, timeouts,
+            idle_rounds, scrape_errors, lean_requests_blocked, lean_bytes_saved,
+            auth_file_pages, auth_file_seconds)
+
+_lock = threading.Lock()
+_server = None
+
+
+def observe_scrape(result, outcome: str = None):
+    """Adds one TweetScrapeResult to the metrics."""
+    with _lock:
+        pages_scraped.inc(source=result.source, stop_reason=result.stop_reason or "unknown")
+        for phase, seconds in result.timings.items():
+            phase_seconds.observe(seconds, phase=phase)
+        handles_found.inc(len(result.handles))
+        reveal_clicks.inc(result.clicks)
+        timeouts.inc(result.timeouts)
+        idle_rounds.inc(result.idle_rounds)
+        for resource_type, count in result.blocked_requests.items():
+            lean_requests_blocked.inc(count, resource_type=resource_type)
+        lean_bytes_saved.inc(result.bytes_saved_estimate)
+        if result.error:
+            scrape_errors.inc()
+        if result.auth_file:
+            auth_file_pages.inc(auth_file=result.auth_file, outcome=outcome or "unknown")
+            auth_file_seconds.inc(result.timings.get("total", 0.0), auth_file=result.auth_file)
+
+
+def render() -> str:
+    """Returns every metric in the Prometheus text exposition format."""
+    with _lock:
+        lines = []
+        for metric in REGISTRY:
+            lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def log_scrape(result, **extra):
+    """Prints one JSON line describing a finished scrape."""
+    print(json.dumps({
+        "event": "tweet_scraped",
+        "ts": round(time.time(), 3),
+        "url": result.url,
+        "source": result.source,
+        "stop_reason": result.stop_reason,
+        "handles": len(result.handles),
+        "clicks": result.clicks,
+        "timeouts": result.timeouts,
+        "idle_rounds": result.idle_rounds,
+        "requests_blocked": sum(result.blocked_requests.values()),
+        "bytes_saved_estimate": result.bytes_saved_estimate,
+        "rate_limited": result.rate_limited,
+        "auth_file": result.auth_file,
+        "error": result.error,
+        "timings": result.timings,
+        **extra,
+    }), flush=True)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1"):
+    """Serves /metrics from a background thread. Safe to call twice."""
+    global _server
+    if _server is not None:
+        return
+    _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
+    print(f"Metrics are served on http://{host}:{port}/metrics.")
+
+
+def stop_metrics_server():
+    global _server
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
@@ -0,0 +1,108 @@
+# reply_cache.py
+# Persistent cache of the reply handles scraped per tweet, kept in its own SQLite
+# file next to bot_data.db so scraper processes never contend with the bot's tables.
+import json
+import time
+from config import env_int
+from database import get_connection
+
+REPLY_CACHE_FILE = "reply_cache.db"
+
+# Without target handles to look for, entries younger than this are reused
+# without opening the tweet at all.
+DEFAULT_FRESH_TTL_SECONDS = 300
+# Entries older than this are deleted. Until then, a tweet whose snapshot
+# already contains every target handle is not opened again.
+DEFAULT_MAX_AGE_SECONDS = 7 * 86400
+# At most this many tweets are kept; the least recently used are evicted first.
+DEFAULT_MAX_ENTRIES = 5000
+
+_initialized = False
+
+
+def initialize_reply_cache():
+    """Creates the cache table if needed. Called lazily by the other functions."""
+    global _initialized
+    with get_connection(REPLY_CACHE_FILE) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tweet_replies (
+                tweet_id TEXT PRIMARY KEY,
+                handles TEXT NOT NULL, -- JSON list of lowercase '@handle' strings
+                scraped_at INTEGER NOT NULL,
+                last_accessed INTEGER NOT NULL
+            )
+        """)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tweet_replies_last_accessed ON tweet_replies (last_accessed)")
+    _initialized = True
+
+
+def _ensure_initialized():
+    if not _initialized:
+        initialize_reply_cache()
+
+
+def get_cached_replies(tweet_id):
+    """
+    Returns the cached snapshot for a tweet as a dict with the keys
+    handles and age_seconds, or None.
+    """
+    _ensure_initialized()
+    now = int(time.time())
+    with get_connection(REPLY_CACHE_FILE) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT handles, scraped_at FROM tweet_replies WHERE tweet_id = ?",
+            (tweet_id,)
+        )
+        row = cursor.fetchone()
+        if not row:
+            return None
+        cursor.execute(
+            "UPDATE tweet_replies SET last_accessed = ? WHERE tweet_id = ?", (now, tweet_id))
+
+    handles, scraped_at = row
+    return {
+        "handles": set(json.loads(handles)),
+        "age_seconds": now - scraped_at,
+    }
+
+
+def store_replies(tweet_id, handles):
+    """Saves (or replaces) the complete snapshot for a tweet, then applies eviction."""
+    _ensure_initialized()
+    now = int(time.time())
+    with get_connection(REPLY_CACHE_FILE) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO tweet_replies (tweet_id, handles, scraped_at, last_accessed)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(tweet_id) DO UPDATE SET
+                handles = excluded.handles,
+                scraped_at = excluded.scraped_at,
+                last_accessed = excluded.last_accessed
+        """, (tweet_id, json.dumps(sorted(handles)), now, now))
+    evict_replies()
+
+
+def evict_replies(max_age_seconds=None, max_entries=None):
+    """Drops expired snapshots and trims the cache to its size limit (LRU)."""
+    if max_age_seconds is None:
+        max_age_seconds = env_int(
+            "REPLY_CACHE_MAX_AGE_SECONDS", DEFAULT_MAX_AGE_SECONDS)
+    if max_entries is None:
+        max_entries = env_int("REPLY_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+
+    _ensure_initialized()
+    with get_connection(REPLY_CACHE_FILE) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "DELETE FROM tweet_replies WHERE scraped_at < ?", (int(time.time()) - max_age_seconds,))
+        cursor.execute("""
+            DELETE FROM tweet_replies WHERE tweet_id IN (
+                SELECT tweet_id FROM tweet_replies
+                ORDER BY last_accessed DESC
+                LIMIT -1 OFFSET ?
+            )
+        """, (max_entries,))
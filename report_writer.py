@@ -0,0 +1,261 @@
+# report_writer.py
+# Builds and delivers verification results: progress updates while a raid is
+# verified, then a compact summary message, plus the full per-participant and
+# per-link results as a CSV or JSON document for raids too large for one
+# Telegram message.
+import csv
+import io
+import json
+import logging
+import os
+import tempfile
+from collections import Counter
+from dataclasses import dataclass, field
+
+RESULT_FORMATS = ("csv", "json")
+DEFAULT_RESULT_FORMAT = "csv"
+# "auto" attaches the results file only when the message had to leave things out.
+ATTACH_MODES = ("auto", "always", "never")
+DEFAULT_ATTACH_MODE = "auto"
+# Files up to this size stay in memory while they are written.
+SPOOL_MAX_BYTES = 1024 * 1024
+
+
+# At most this many found participants are named in a progress update.
+MAX_PROGRESS_HANDLES = 15
+
+
+class ProgressTally:
+    """
+    Running counts of the links finished so far, for status updates. Each
+    finished link is added once, so an update costs only the links that
+    finished since the previous one.
+    """
+
+    def __init__(self, target_usernames: list, total_links: int):
+        self.target_usernames = list(target_usernames)
+        self.total_links = total_links
+        self.checked = 0
+        self.failed = 0
+        self.found_counts = Counter()
+        self._originals = {handle.lower(): handle for handle in target_usernames}
+
+    def add(self, results: list):
+        for tweet_result in results:
+            self.checked += 1
+            if tweet_result.error:
+                self.failed += 1
+            self.found_counts.update(self._originals[handle] for handle in tweet_result.handles
+                                     if handle in self._originals)
+
+    def text(self) -> str:
+        """A short Markdown tally of the links finished so far."""
+        text = f"🔬 **Progress:** {self.checked} of {self.total_links} links checked"
+        text += f" ({self.failed} failed).\n" if self.failed else ".\n"
+        if self.found_counts:
+            shown = [f"`{handle}` ({count})" for handle,
+                     count in self.found_counts.most_common(MAX_PROGRESS_HANDLES)]
+            text += "Found so far: " + ", ".join(shown)
+            if len(self.found_counts) > MAX_PROGRESS_HANDLES:
+                text += f" and {len(self.found_counts) - MAX_PROGRESS_HANDLES} more"
+            text += ".\n"
+        not_seen = len(self.target_usernames) - len(self.found_counts)
+        if not_seen:
+            text += f"Not seen yet: {not_seen} participant(s).\n"
+        return text
+
+
+# Above this many links the per-link details are summarized by stop reason.
+MAX_PER_LINK_DETAILS = 10
+# At most this many participants are listed per section of the report message;
+# the full lists go in the attached results file.
+MAX_REPORT_HANDLES = 40
+# Telegram rejects longer messages.
+MAX_MESSAGE_CHARS = 4096
+
+
+@dataclass
+class VerificationSummary:
+    """The structured outcome of a verification: per-URL results and per-participant hits."""
+    results: list
+    target_usernames: list
+    sampled: bool = True
+    # Original participant handle -> number of links they commented on.
+    hit_counts: Counter = field(default_factory=Counter)
+    # URL -> original handles of the participants found under it.
+    hits_by_url: dict = field(default_factory=dict)
+
+    @property
+    def links_checked(self) -> int:
+        return len(self.results)
+
+    def found_handles(self) -> list:
+        """Participants found at least once, most active first."""
+        return [handle for handle, count in self.hit_counts.most_common() if count > 0]
+
+    def not_found_handles(self) -> list:
+        return [handle for handle in self.target_usernames if self.hit_counts[handle] == 0]
+
+
+def summarize_results(results: list, target_usernames: list, sampled: bool = True) -> VerificationSummary:
+    """Cross-references scraped handles with the participants (case-insensitive)."""
+    # Handle sets contain ONLY lowercase handles; counts are kept against the
+    # participant's original, properly capitalized handle.
+    originals = {handle.lower(): handle for handle in target_usernames}
+    summary = VerificationSummary(results, list(target_usernames), sampled)
+    for handle in target_usernames:
+        summary.hit_counts[handle] = 0
+    for tweet_result in results:
+        hits = sorted(originals[handle]
+                      for handle in tweet_result.handles if handle in originals)
+        summary.hits_by_url[tweet_result.url] = hits
+        summary.hit_counts.update(hits)
+    return summary
+
+
+def format_summary(summary: VerificationSummary, results_attached: bool = False) -> str:
+    """
+    Builds the Markdown report message. Long participant lists are cut at
+    MAX_REPORT_HANDLES entries, and the message never exceeds Telegram's limit.
+    """
+    total_links_checked = summary.links_checked
+    links_label = "random links" if summary.sampled else "links (all submitted)"
+    lines = [
+        "✅ **Verification Report** ✅",
+        "",
+        f"Checked **{total_links_checked}** {links_label}. The following raid participants were found:",
+        "",
+    ]
+
+    found_users = summary.found_handles()
+    if found_users:
+        for handle in found_users[:MAX_REPORT_HANDLES]:
+            count = summary.hit_counts[handle]
+            lines.append(
+                f" • `{handle}` - Commented on **{count} of {total_links_checked}** links.")
+        if len(found_users) > MAX_REPORT_HANDLES:
+            lines.append(
+                f" _…and {len(found_users) - MAX_REPORT_HANDLES} more._")
+    else:
+        lines.append("_None of the participants were found in the comments._")
+    lines.append("")
+
+    not_found_users = summary.not_found_handles()
+    if not_found_users:
+        lines.append(f"❌ **Participants NOT Found:** ({len(not_found_users)})")
+        for handle in not_found_users[:MAX_REPORT_HANDLES]:
+            lines.append(f" • `{handle}`")
+        if len(not_found_users) > MAX_REPORT_HANDLES:
+            lines.append(
+                f" _…and {len(not_found_users) - MAX_REPORT_HANDLES} more._")
+
+    lines.append("")
+    lines.append("🔎 **Per-link details:**")
+    if total_links_checked <= MAX_PER_LINK_DETAILS:
+        for i, tweet_result in enumerate(summary.results):
+            lines.append(f" {i + 1}. {len(tweet_result.handles)} handles, "
+                         f"stopped: `{tweet_result.stop_reason or 'unknown'}`")
+    else:
+        stop_reasons = Counter(
+            tweet_result.stop_reason or "unknown" for tweet_result in summary.results)
+        for reason, count in stop_reasons.most_common():
+            lines.append(f" • `{reason}`: {count} links")
+
+    footer = "\n\n📎 The full results are in the attached file." if results_attached else ""
+    report = "\n".join(lines)
+    if len(report) + len(footer) > MAX_MESSAGE_CHARS:
+        cut = report.rfind("\n", 0, MAX_MESSAGE_CHARS - len(footer) - 20)
+        report = report[:cut] + "\n _…(cut)_"
+    return report + footer
+
+
+def write_results_csv(summary: VerificationSummary, stream):
+    """Writes one row per participant, then one row per link, to a text stream."""
+    writer = csv.writer(stream)
+    writer.writerow(["participant", "links_commented", "links_checked", "commented_on"])
+    links_by_handle = {}
+    for url, hits in summary.hits_by_url.items():
+        for handle in hits:
+            links_by_handle.setdefault(handle, []).append(url)
+    for handle in summary.target_usernames:
+        writer.writerow([handle, summary.hit_counts[handle], summary.links_checked,
+                         " ".join(links_by_handle.get(handle, ()))])
+
+    writer.writerow([])
+    writer.writerow(["link", "handles_found", "participants_found", "stop_reason", "error"])
+    for tweet_result in summary.results:
+        writer.writerow([tweet_result.url, len(tweet_result.handles),
+                         len(summary.hits_by_url.get(tweet_result.url, ())),
+                         tweet_result.stop_reason or "", tweet_result.error or ""])
+
+
+def write_results_json(summary: VerificationSummary, stream):
+    """Writes the results as one JSON object, one participant or link at a time."""
+    stream.write('{"links_checked": %d, "sampled": %s, "participants": [\n'
+                 % (summary.links_checked, json.dumps(summary.sampled)))
+    for index, handle in enumerate(summary.target_usernames):
+        stream.write(",\n" if index else "")
+        stream.write(json.dumps({"handle": handle, "links_commented": summary.hit_counts[handle]}))
+    stream.write('\n], "links": [\n')
+    for index, tweet_result in enumerate(summary.results):
+        stream.write(",\n" if index else "")
+        stream.write(json.dumps({
+            "url": tweet_result.url,
+            "handles_found": len(tweet_result.handles),
+            "participants_found": summary.hits_by_url.get(tweet_result.url, []),
+            "stop_reason": tweet_result.stop_reason,
+            "error": tweet_result.error,
+        }))
+    stream.write("\n]}\n")
+
+
+def build_results_file(summary: VerificationSummary, raid_id: int, result_format: str = None):
+    """
+    Writes the full results to a temporary file (kept in memory while small).
+    Returns (binary file positioned at the start, file name).
+    """
+    if result_format is None:
+        result_format = os.getenv("VERIFICATION_RESULTS_FORMAT", DEFAULT_RESULT_FORMAT)
+    if result_format not in RESULT_FORMATS:
+        result_format = DEFAULT_RESULT_FORMAT
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    text = io.TextIOWrapper(output, encoding="utf-8", newline="")
+    if result_format == "json":
+        write_results_json(summary, text)
+    else:
+        write_results_csv(summary, text)
+    text.flush()
+    text.detach()
+    output.seek(0)
+    return output, f"raid_{raid_id}_results.{result_format}"
+
+
+def needs_attachment(summary: VerificationSummary) -> bool:
+    mode = os.getenv("VERIFICATION_ATTACH_RESULTS", DEFAULT_ATTACH_MODE)
+    if mode == "always":
+        return True
+    if mode == "never":
+        return False
+    return (len(summary.found_handles()) > MAX_REPORT_HANDLES
+            or len(summary.not_found_handles()) > MAX_REPORT_HANDLES
+            or summary.links_checked > MAX_PER_LINK_DETAILS
+            or len(format_summary(summary)) >= MAX_MESSAGE_CHARS)
+
+
+async def send_verification_report(bot, chat_id: int, raid_id: int, summary: VerificationSummary):
+    """Sends the summary message and, when needed, the full results as a document."""
+    attach = needs_attachment(summary)
+    await bot.send_message(chat_id, format_summary(summary, results_attached=attach),
+                           parse_mode='Markdown')
+    if not attach:
+        return
+    document, filename = build_results_file(summary, raid_id)
+    try:
+        await bot.send_document(chat_id, document=document, filename=filename,
+                                caption=f"Full verification results for Raid #{raid_id}.")
+    except Exception as e:
+        logging.error(f"Could not send the results file for raid {raid_id}: {e}")
+        await bot.send_message(chat_id, "⚠️ The full results file could not be sent.")
+    finally:
+        document.close()
@@ -0,0 +1,171 @@
+# resource_monitor.py
+# Memory readings for this process and the browsers it launched, and the memory
+# budget the scraper works within.
+# Uses psutil when it is installed and falls back to /proc on Linux.
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from config import env_int
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# RSS of this process plus its browsers above which browsers are recycled and
+# fewer pages run at once. 0 disables the budget.
+DEFAULT_MEMORY_BUDGET_MB = 2048
+# Host memory that should stay available; below it fewer pages run at once.
+DEFAULT_MIN_FREE_MEMORY_MB = 512
+# Pages allowed at once while memory is short.
+DEFAULT_LOW_MEMORY_CONCURRENCY = 1
+# Readings are reused for this long; walking /proc is not free.
+SAMPLE_MAX_AGE = 1.0
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _proc_children() -> dict:
+    """Maps every parent PID to the list of its child PIDs, read from /proc."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name may contain spaces, so fields are counted after its ')'.
+        parent = int(stat.rsplit(")", 1)[1].split()[1])
+        children.setdefault(parent, []).append(int(entry))
+    return children
+
+
+def _proc_rss(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def process_tree_rss(pid: int = None) -> int:
+    """
+    Returns the resident memory in bytes of `pid` (this process by default)
+    plus all of its descendants, which includes Playwright's driver and every
+    Chromium process it started. Returns 0 when it cannot be measured.
+    """
+    pid = pid or os.getpid()
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            total = root.memory_info().rss
+            for child in root.children(recursive=True):
+                try:
+                    total += child.memory_info().rss
+                except psutil.Error:
+                    pass
+            return total
+        except psutil.Error:
+            return 0
+
+    if not os.path.isdir("/proc"):
+        return 0
+    children = _proc_children()
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        total += _proc_rss(current)
+        pending.extend(children.get(current, ()))
+    return total
+
+
+def available_memory() -> int:
+    """Returns the host's available memory in bytes, or 0 if it is unknown."""
+    if psutil is not None:
+        return psutil.virtual_memory().available
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+_last_sample = (0.0, 0, 0)
+
+
+def sample_memory() -> tuple:
+    """Returns (process tree RSS, host available memory) in bytes, cached briefly."""
+    global _last_sample
+    taken_at, rss, available = _last_sample
+    if time.monotonic() - taken_at > SAMPLE_MAX_AGE:
+        rss, available = process_tree_rss(), available_memory()
+        _last_sample = (time.monotonic(), rss, available)
+    return rss, available
+
+
+def over_memory_budget() -> bool:
+    """True when this process and its browsers use more than the budget."""
+    budget_mb = env_int("SCRAPER_MEMORY_BUDGET_MB", DEFAULT_MEMORY_BUDGET_MB)
+    if budget_mb <= 0:
+        return False
+    rss, _ = sample_memory()
+    return rss > budget_mb * 1024 * 1024
+
+
+def host_memory_low() -> bool:
+    """True when the host has less available memory than the configured minimum."""
+    _, available = sample_memory()
+    minimum = env_int("SCRAPER_MIN_FREE_MEMORY_MB", DEFAULT_MIN_FREE_MEMORY_MB)
+    return 0 < available < minimum * 1024 * 1024
+
+
+class MemoryGate:
+    """
+    Back-pressure for page scrapes. While this process is over its memory
+    budget or the host is short on memory, only a few pages (see
+    SCRAPER_LOW_MEMORY_CONCURRENCY) may run at once; the rest wait.
+    """
+
+    def __init__(self):
+        self.active = 0
+        self._condition = None
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            announced = False
+            while True:
+                if not (over_memory_budget() or host_memory_low()):
+                    break
+                limit = max(1, env_int("SCRAPER_LOW_MEMORY_CONCURRENCY",
+                                       DEFAULT_LOW_MEMORY_CONCURRENCY))
+                if self.active < limit:
+                    break
+                if not announced:
+                    print("Memory is short; waiting for running pages to finish.")
+                    announced = True
+                try:
+                    # Memory frees up without a notification, so re-check periodically.
+                    await asyncio.wait_for(self._condition.wait(), timeout=SAMPLE_MAX_AGE)
+                except asyncio.TimeoutError:
+                    pass
+            self.active += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.active -= 1
+                self._condition.notify_all()
+
+
+# Shared by every scrape in this process.
+memory_gate = MemoryGate()
@@ -0,0 +1,303 @@
+# scrape_worker.py
+# Runs the scraper in dedicated worker processes so browser driving and report
+# building never compete with the bot's own event loop.
+import argparse
+import asyncio
+import atexit
+import json
+import multiprocessing
+import os
+import socket
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import env_int
+
+# Each worker drives its own Chromium, which itself uses more than one core,
+# so by default one worker is started per two CPU cores.
+DEFAULT_WORKER_PROCESSES = max(1, (os.cpu_count() or 2) // 2)
+
+# A job whose worker process died (e.g. killed for using too much memory) is
+# retried this many times, each time on a freshly started pool.
+MAX_JOB_RESTARTS = 1
+
+# --- Worker-process side ---
+# Each worker keeps one event loop for its whole life so its warm browser pool
+# (started in the initializer) survives between jobs.
+_worker_loop = None
+
+
+def _init_worker():
+    """Runs once in every worker process: creates its loop and warms a browser."""
+    global _worker_loop
+    import browser_pool
+    import scraper
+
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    if scraper.uses_warm_browser():
+        try:
+            _worker_loop.run_until_complete(browser_pool.shared_pool.start())
+        except Exception as e:
+            # The scraper falls back to a temporary browser per job.
+            print(f"Scrape worker could not start its browser pool: {e}")
+    atexit.register(_shutdown_worker)
+
+
+def _shutdown_worker():
+    import browser_pool
+
+    if _worker_loop is not None and not _worker_loop.is_closed():
+        _worker_loop.run_until_complete(browser_pool.shared_pool.stop())
+        _worker_loop.close()
+
+
+def _run_verification_job(raid_id, participant_ids, target_usernames):
+    import scraper
+
+    return _worker_loop.run_until_complete(
+        scraper.run_verification_tasks(raid_id, participant_ids, target_usernames))
+
+
+# --- Bot side ---
+
+class ScrapeWorkerPool:
+    """
+    A pool of scraper worker processes with an async submit interface.
+    Jobs are plain function calls with picklable arguments and results.
+    """
+
+    def __init__(self, processes: int = None):
+        self.processes = processes
+        self._executor = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._executor is not None
+
+    def start(self):
+        if self.is_running:
+            return
+        if self.processes is None:
+            self.processes = env_int(
+                "SCRAPER_WORKER_PROCESSES", DEFAULT_WORKER_PROCESSES)
+        self.processes = max(1, self.processes)
+        self._executor = self._create_executor()
+        print(f"Started {self.processes} scrape worker process(es).")
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # "spawn" gives each worker a clean interpreter: no copied event loop,
+        # Telegram connections or Playwright state from the bot process.
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        """Replaces a pool that lost a worker process; a broken pool accepts no more jobs."""
+        if self._executor is not broken:
+            # Another job that failed at the same time already replaced it.
+            return
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._create_executor()
+        print("A scrape worker process died; the worker pool was restarted.")
+
+    def stop(self):
+        """
+        Stops the worker processes without waiting for running jobs, which can
+        take hours. Their progress is checkpointed per URL, and the tasks they
+        leave running are re-queued when the bot starts again.
+        """
+        if not self.is_running:
+            return
+        executor, self._executor = self._executor, None
+        # Copied first: the executor forgets its processes as they exit.
+        processes = list((executor._processes or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join(timeout=5)
+        print("Scrape worker processes stopped.")
+
+    async def submit(self, func, *args):
+        """Runs `func(*args)` in a worker process and awaits its result."""
+        if not self.is_running:
+            raise RuntimeError("The scrape worker pool has not been started.")
+        loop = asyncio.get_running_loop()
+        restarts = 0
+        while True:
+            executor = self._executor
+            try:
+                return await loop.run_in_executor(executor, func, *args)
+            except BrokenProcessPool:
+                if self._executor is None:
+                    raise
+                self._restart(executor)
+                if restarts >= MAX_JOB_RESTARTS:
+                    raise
+                restarts += 1
+
+    async def run_verification_tasks(self, raid_id: int, participant_ids: list, target_usernames: list) -> int:
+        """Same contract as scraper.run_verification_tasks, executed in a worker."""
+        return await self.submit(_run_verification_job, raid_id, list(participant_ids),
+                                 list(target_usernames))
+
+    async def run_verification_sharded(self, raid_id: int, participant_ids: list, target_usernames: list,
+                                       shards: int = None) -> int:
+        """
+        Runs the raid's queued tasks on `shards` workers at once (all of them by
+        default). Every worker claims URLs from the same queue, so the work is
+        balanced dynamically and results are merged in the database.
+        Returns the total number of tasks processed.
+        """
+        shards = max(1, shards or self.processes or 1)
+        counts = await asyncio.gather(*[
+            self.run_verification_tasks(raid_id, participant_ids, target_usernames)
+            for _ in range(shards)
+        ])
+        return sum(counts)
+
+
+# The pool used by the bot. It is started from the bot's post_init hook.
+shared_workers = ScrapeWorkerPool()
+
+
+# --- Remote worker side ---
+# Run on any host that can reach the bot's coordinator:
+#   python scrape_worker.py --coordinator 192.168.1.10:8765 --concurrency 2
+# The token is read from --token or the COORDINATOR_TOKEN environment variable.
+
+REMOTE_POLL_INTERVAL = 5.0
+REMOTE_RECONNECT_DELAY = 10.0
+# Large enough for a storage state or a big handle set in one line.
+REMOTE_MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+
+class _CoordinatorConnection:
+    """One request/response JSON-lines connection, shared by a worker's task loops."""
+
+    def __init__(self, host: str, port: int, token: str, worker_id: str):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.worker_id = worker_id
+        self._reader = None
+        self._writer = None
+        self._lock = asyncio.Lock()
+
+    async def call(self, op: str, **fields) -> dict:
+        async with self._lock:
+            if self._writer is None:
+                self._reader, self._writer = await asyncio.open_connection(
+                    self.host, self.port, limit=REMOTE_MAX_MESSAGE_BYTES)
+            message = {"op": op, "token": self.token,
+                       "worker_id": self.worker_id, **fields}
+            try:
+                self._writer.write(json.dumps(message).encode() + b"\n")
+                await self._writer.drain()
+                line = await self._reader.readline()
+                if not line:
+                    raise ConnectionError("The coordinator closed the connection.")
+            except Exception:
+                self.close()
+                raise
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise RuntimeError(f"Coordinator error: {response.get('error')}")
+        return response
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+
+async def _heartbeat_loop(connection: _CoordinatorConnection, task_id: int, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            response = await connection.call("heartbeat", task_id=task_id)
+            if not response.get("still_assigned"):
+                print(f"Task {task_id} was reassigned; finishing it anyway.")
+        except Exception as e:
+            print(f"Heartbeat for task {task_id} failed: {e}")
+
+
+async def _remote_task_loop(connection: _CoordinatorConnection):
+    import scraper
+
+    while True:
+        try:
+            response = await connection.call("claim")
+        except Exception as e:
+            print(f"Could not reach the coordinator: {e}")
+            await asyncio.sleep(REMOTE_RECONNECT_DELAY)
+            continue
+
+        task = response.get("task")
+        if not task:
+            await asyncio.sleep(REMOTE_POLL_INTERVAL)
+            continue
+
+        print(f"Claimed task {task['task_id']}: {task['url']}")
+        heartbeat = asyncio.create_task(_heartbeat_loop(
+            connection, task["task_id"], task["lease_seconds"] / 3))
+        try:
+            result = await scraper.scrape_task(task["url"], task["storage_state"],
+                                               set(task["target_handles"]))
+        finally:
+            heartbeat.cancel()
+
+        try:
+            await connection.call("complete", task_id=task["task_id"], result=result.to_dict())
+        except Exception as e:
+            # The lease will expire and the coordinator will hand the task out again.
+            print(f"Could not report task {task['task_id']}: {e}")
+
+
+async def run_remote_worker(host: str, port: int, token: str, concurrency: int = 1):
+    """Pulls tasks from the coordinator until interrupted."""
+    import browser_pool
+    import scraper
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    connection = _CoordinatorConnection(host, port, token, worker_id)
+    if scraper.uses_warm_browser():
+        await browser_pool.shared_pool.start()
+    print(f"Remote scrape worker {worker_id} connected to {host}:{port} "
+          f"with {concurrency} task loop(s).")
+    try:
+        await asyncio.gather(*[_remote_task_loop(connection) for _ in range(concurrency)])
+    finally:
+        connection.close()
+        await browser_pool.shared_pool.stop()
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(
+        description="Standalone scrape worker that pulls verification tasks from the bot.")
+    parser.add_argument("--coordinator", required=True,
+                        help="HOST:PORT of the bot's task coordinator")
+    parser.add_argument("--token", default=os.getenv("COORDINATOR_TOKEN"),
+                        help="shared secret (defaults to COORDINATOR_TOKEN)")
+    parser.add_argument("--concurrency", type=int, default=env_int("SCRAPER_MAX_CONCURRENT_PAGES", 1),
+                        help="number of tasks scraped at once")
+    args = parser.parse_args()
+
+    if not args.token:
+        parser.error("a coordinator token is required (--token or COORDINATOR_TOKEN)")
+    host, _, port = args.coordinator.rpartition(":")
+    try:
+        asyncio.run(run_remote_worker(host or "127.0.0.1", int(port), args.token,
+                                      max(1, args.concurrency)))
+    except KeyboardInterrupt:
+        print("Remote scrape worker stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,237 @@
 import asyncio
 import os
 import random
-from collections import Counter, defaultdict
-from playwright.async_api import async_playwright
+import re
+from urllib.parse import urlparse
+import json
+import socket
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field, fields
+import database
+from browser_pool import acquire_pool
+from config import env_float, env_int
+import http_backend
+from lean_mode import enable_lean_mode
+import metrics
+import reply_cache
+import resource_monitor
+import session_pool
+from tweet_detail import REPLY_CURSOR_TYPES, TweetDetailCollector, parse_tweet_detail
+
+# How many tweet pages (each in its own browser context) may be scraped at once.
+DEFAULT_MAX_CONCURRENT_PAGES = 3
+
+# Lease on a claimed verification task; it is renewed while the URL is being
+# handled (including any wait for a free auth session).
+TASK_LEASE_SECONDS = 600
+
+# Scrolling stops after this many rounds in a row without new handles or articles...
+DEFAULT_SCROLL_STABLE_ROUNDS = 3
+# ...or after this many rounds in total, whichever comes first.
+DEFAULT_SCROLL_MAX_ROUNDS = 40
+# How long a single round waits for new replies to appear before giving up.
+DEFAULT_SCROLL_ROUND_TIMEOUT = 4.0
+
+# "graphql" reads reply authors from intercepted TweetDetail responses and falls
+# back to the DOM harvester when none were seen; "dom" uses the harvester only.
+EXTRACTION_MODES = ("graphql", "dom")
+DEFAULT_EXTRACTION_MODE = "graphql"
+
+# The reveal stage clicks every control whose text starts with one of these
+# (lowercase), for at most this many rounds.
+REVEAL_BUTTON_PREFIXES = ("show more replies", "show additional replies",
+                          "show replies", "show probable spam")
+DEFAULT_REVEAL_MAX_ROUNDS = 5
+
+# "browser" drives Chromium. "http" requests TweetDetail directly with the
+# session's cookies and falls back to the browser when a request fails.
+SCRAPER_BACKENDS = ("browser", "http")
+DEFAULT_SCRAPER_BACKEND = "browser"
+# Without a browser per page, far more tweets can be checked at once.
+DEFAULT_HTTP_CONCURRENT_REQUESTS = 24
+# The HTTP backend follows at most this many reply pages per tweet.
+DEFAULT_HTTP_MAX_PAGES = 50
+
+# Lean mode blocks images, video, fonts and trackers. Set SCRAPER_LEAN_MODE=0 to disable.
+DEFAULT_LEAN_MODE = 1
+
+TWEET_ID_PATTERN = re.compile(r"/status(?:es)?/(\d+)")
+
+# Why the scrape of a tweet stopped, reported per URL in the results.
+STOP_ALL_TARGETS_FOUND = "all_targets_found"
+STOP_CONVERGED = "converged"
+STOP_MAX_ROUNDS = "max_rounds"
+STOP_ERROR = "error"
+STOP_CACHE_FRESH = "cache_fresh"
+STOP_ALL_TARGETS_CACHED = "all_targets_cached"
+STOP_NO_SESSION = "no_session"
+
+# Injected once per page. A MutationObserver records the author handle of every
+# reply article as soon as it is mounted, so replies that X later unmounts while
+# virtualizing the list are not lost. The raided tweet itself is skipped.
+_INSTALL_HARVESTER_JS = """
+({ focalId }) => {
+    if (window.__raidHarvester) {
+        return window.__raidHarvester.handles.size;
+    }
+    const ARTICLE = 'article[data-testid="tweet"]';
+    const USER_LINK = 'div[data-testid="User-Name"] a[href^="/"][role="link"]';
+    const focalSuffix = focalId ? `/status/${focalId}` : null;
+    // Without a tweet ID, fall back to skipping the first article on the page.
+    const focalArticle = focalSuffix ? null : document.querySelector(ARTICLE);
+    const handles = new Set();
+
+    const harvest = (article) => {
+        if (article === focalArticle) {
+            return;
+        }
+        if (focalSuffix) {
+            const time = article.querySelector('a[href*="/status/"] time');
+            const statusHref = time && time.parentElement.getAttribute('href');
+            if (statusHref && statusHref.endsWith(focalSuffix)) {
+                return;
+            }
+        }
+        const link = article.querySelector(USER_LINK);
+        const href = link && link.getAttribute('href');
+        if (href) {
+            handles.add('@' + href.replace(/^\\/+/, '').toLowerCase());
+        }
+    };
+
+    const scan = (root) => {
+        if (root.matches && root.matches(ARTICLE)) {
+            harvest(root);
+        } else if (root.closest) {
+            const parent = root.closest(ARTICLE);
+            if (parent) {
+                harvest(parent);
+            }
+        }
+        root.querySelectorAll(ARTICLE).forEach(harvest);
+    };
+
+    const observer = new MutationObserver((mutations) => {
+        for (const mutation of mutations) {
+            for (const node of mutation.addedNodes) {
+                if (node.nodeType === Node.ELEMENT_NODE) {
+                    scan(node);
+                }
+            }
+        }
+    });
+    observer.observe(document.body, { childList: true, subtree: true });
+    scan(document);
+    // Mounted articles are counted too, so slow-rendering replies keep the loop going.
+    const progress = () => handles.size + document.querySelectorAll(ARTICLE).length;
+    window.__raidHarvester = { handles, scan, progress };
+    return handles.size;
+}
+"""
+
+# Returns every handle recorded so far in a single round-trip.
+_COLLECT_HANDLES_JS = """
+() => {
+    const harvester = window.__raidHarvester;
+    if (!harvester) {
+        return [];
+    }
+    harvester.scan(document);
+    return Array.from(harvester.handles);
+}
+"""
+
+
+# Returns the target handles the harvester has not recorded yet.
+_MISSING_TARGETS_JS = """
+(targets) => {
+    const harvester = window.__raidHarvester;
+    return harvester ? targets.filter((t) => !harvester.handles.has(t)) : targets;
+}
+"""
+
+# Clicks every collapsed-replies and probable-spam control on the page in one
+# pass and returns how many were clicked. Controls are matched by the start of
+# their text, so unrelated buttons that merely contain "Show" are never clicked.
+# A control that stays mounted after its click is marked and not clicked again.
+_REVEAL_ALL_JS = """
+(prefixes) => {
+    let clicked = 0;
+    // Spans are included because "Show probable spam" is not always a button;
+    // elements inside an already clicked control are skipped.
+    for (const el of document.querySelectorAll('[role="button"], button, span')) {
+        if (el.closest('[data-raid-revealed]')) {
+            continue;
+        }
+        const text = (el.innerText || '').trim().toLowerCase();
+        if (!prefixes.some((prefix) => text.startsWith(prefix))) {
+            continue;
+        }
+        el.dataset.raidRevealed = '1';
+        el.click();
+        clicked++;
+    }
+    return clicked;
+}
+"""
+
+# Progress signal for the scroll loop (see `progress` in the harvester).
+_PROGRESS_JS = """
+() => window.__raidHarvester ? window.__raidHarvester.progress() : 0
+"""
+
+# Resolves as soon as the progress signal has grown past the given value.
+_WAIT_FOR_PROGRESS_JS = """
+(previous) => (window.__raidHarvester ? window.__raidHarvester.progress() : 0) > previous
+"""
+
+
+@dataclass
+class TweetScrapeResult:
+    """What a single tweet scrape produced."""
+    url: str
+    handles: set = field(default_factory=set)
+    # Where the handles came from: "graphql", "dom", "http", "cache" or "none".
+    source: str = "none"
+    # Pagination cursors seen in TweetDetail responses, by cursor type.
+    cursors: dict = field(default_factory=dict)
+    newest_reply_id: int = 0
+    error: str = None
+    rate_limited: bool = False
+    stop_reason: str = None
+    auth_file: str = None
+    # Seconds spent per phase: navigate, scroll, reveal, extract and total.
+    timings: dict = field(default_factory=dict)
+    # Reveal buttons clicked, and waits that ran into their timeout (page
+    # load, first reply, replies after a reveal click).
+    clicks: int = 0
+    timeouts: int = 0
+    # Scroll rounds that brought nothing new. Every finished scroll ends with
+    # a few of these, so they are not timeouts.
+    idle_rounds: int = 0
+    # Lean mode: requests aborted per resource type, and the bytes that saved.
+    blocked_requests: dict = field(default_factory=dict)
+    bytes_saved_estimate: int = 0
+
+    def to_dict(self) -> dict:
+        """A JSON-friendly form, used to checkpoint results in the database."""
+        data = asdict(self)
+        data["handles"] = sorted(self.handles)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TweetScrapeResult":
+        data = dict(data)
+        data["handles"] = set(data.get("handles") or ())
+        known_fields = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known_fields})
+
+
+def extract_tweet_id(tweet_url: str):
+    """Returns the numeric status ID of a tweet URL, or None if it has none."""
+    match = TWEET_ID_PATTERN.search(tweet_url)
+    return match.group(1) if match else None
 
 
 async def human_wait(min_s=0.5, max_s=1.2):
@@ -11,162 +240,562 @@ async def human_wait(min_s=0.5, max_s=1.2):
     await asyncio.sleep(random.uniform(min_s, max_s))
 
 
-async def scrape_single_tweet(context, tweet_url: str) -> set:
+async def _measure_progress(page, collector=None) -> tuple:
+    """Returns (DOM progress, total progress including parsed TweetDetail data)."""
+    dom_progress = await page.evaluate(_PROGRESS_JS)
+    total = dom_progress
+    if collector is not None:
+        total += collector.progress()
+    return dom_progress, total
+
+
+async def _wait_for_new_replies(page, previous: tuple, timeout_s: float, collector=None) -> bool:
+    """
+    Waits until new replies are mounted or the network goes quiet, whichever
+    comes first. Returns True if the page made progress.
+    """
+    previous_dom, previous_total = previous
+    try:
+        await page.wait_for_function(
+            _WAIT_FOR_PROGRESS_JS, arg=previous_dom, timeout=timeout_s * 1000)
+        return True
+    except Exception:
+        pass
+    # Nothing new was rendered in time; give in-flight requests a short
+    # moment to settle in case a slow page of replies is still arriving.
+    try:
+        await page.wait_for_load_state("networkidle", timeout=1000)
+    except Exception:
+        pass
+    if collector is not None:
+        await collector.drain()
+    _, total = await _measure_progress(page, collector)
+    return total > previous_total
+
+
+async def _missing_targets(page, collector, target_handles: set) -> set:
+    """Returns the target handles that neither the DOM nor the network has shown yet."""
+    missing = set(await page.evaluate(_MISSING_TARGETS_JS, sorted(target_handles)))
+    if collector is not None:
+        missing -= collector.handles
+    return missing
+
+
+async def scroll_until_stable(page, stable_rounds: int = None, max_rounds: int = None,
+                              round_timeout_s: float = None, collector=None,
+                              is_done=None, result: TweetScrapeResult = None) -> tuple:
+    """
+    Scrolls the reply list until the number of harvested handles and mounted
+    articles (plus parsed TweetDetail data, when a collector is given) stops
+    growing for `stable_rounds` rounds, or `max_rounds` is hit. The optional
+    `is_done` coroutine function is checked after every round to stop early.
+    Rounds without progress are counted on `result`, if given.
+    Returns (rounds performed, stop reason).
+    """
+    if stable_rounds is None:
+        stable_rounds = env_int(
+            "SCRAPER_SCROLL_STABLE_ROUNDS", DEFAULT_SCROLL_STABLE_ROUNDS)
+    if max_rounds is None:
+        max_rounds = env_int("SCRAPER_SCROLL_MAX_ROUNDS",
+                             DEFAULT_SCROLL_MAX_ROUNDS)
+    if round_timeout_s is None:
+        round_timeout_s = env_float(
+            "SCRAPER_SCROLL_ROUND_TIMEOUT", DEFAULT_SCROLL_ROUND_TIMEOUT)
+
+    rounds_without_progress = 0
+    rounds = 0
+    while rounds < max_rounds and rounds_without_progress < stable_rounds:
+        if is_done is not None and await is_done():
+            return rounds, STOP_ALL_TARGETS_FOUND
+        rounds += 1
+        progress = await _measure_progress(page, collector)
+        await page.evaluate("window.scrollBy(0, document.body.scrollHeight)")
+        if await _wait_for_new_replies(page, progress, round_timeout_s, collector):
+            rounds_without_progress = 0
+        else:
+            rounds_without_progress += 1
+            if result is not None:
+                result.idle_rounds += 1
+    if is_done is not None and await is_done():
+        return rounds, STOP_ALL_TARGETS_FOUND
+    return rounds, STOP_CONVERGED if rounds_without_progress >= stable_rounds else STOP_MAX_ROUNDS
+
+
+async def reveal_all_replies(page, max_rounds: int = None, round_timeout_s: float = None,
+                             collector=None, is_done=None, result: TweetScrapeResult = None) -> int:
+    """
+    Expands collapsed reply branches and probable spam. Each round clicks every
+    matching control at once, then waits for new replies instead of sleeping.
+    Stops when a round finds nothing to click, after `max_rounds` rounds, or
+    when `is_done` says so (raising _AllTargetsFound). Clicks and rounds that
+    time out are counted on `result`, if given. Returns the rounds performed.
+    """
+    if max_rounds is None:
+        max_rounds = env_int("SCRAPER_REVEAL_MAX_ROUNDS",
+                             DEFAULT_REVEAL_MAX_ROUNDS)
+    if round_timeout_s is None:
+        round_timeout_s = env_float(
+            "SCRAPER_SCROLL_ROUND_TIMEOUT", DEFAULT_SCROLL_ROUND_TIMEOUT)
+
+    rounds = 0
+    while rounds < max_rounds:
+        if is_done is not None and await is_done():
+            raise _AllTargetsFound()
+        progress = await _measure_progress(page, collector)
+        clicked = await page.evaluate(_REVEAL_ALL_JS, list(REVEAL_BUTTON_PREFIXES))
+        if not clicked:
+            break
+        rounds += 1
+        print(f"Clicked {clicked} reveal control(s) in round {rounds}.")
+        if result is not None:
+            result.clicks += clicked
+        if not await _wait_for_new_replies(page, progress, round_timeout_s, collector):
+            if result is not None:
+                result.timeouts += 1
+    return rounds
+
+
+async def scrape_single_tweet(context, tweet_url: str, extraction_mode: str = None,
+                              target_handles=None) -> TweetScrapeResult:
     """
     Scrapes a single tweet URL for all unique commenter handles.
-    It scrolls, clicks "Show more replies", AND clicks "Show probable spam"
-    before extracting handles.
+    It scrolls, then expands every "Show more replies" and "Show probable spam"
+    section (see reveal_all_replies) before extracting handles.
+    In "graphql" mode the handles are read from the TweetDetail responses the
+    page downloads; the DOM harvester is only used if none were intercepted.
+    If `target_handles` (lowercase) is given, the scrape stops as soon as all
+    of them have been seen; `stop_reason` on the result says why it stopped.
     """
+    if extraction_mode is None:
+        extraction_mode = os.getenv(
+            "SCRAPER_EXTRACTION_MODE", DEFAULT_EXTRACTION_MODE)
+    if extraction_mode not in EXTRACTION_MODES:
+        print(
+            f"Unknown extraction mode {extraction_mode!r}, using {DEFAULT_EXTRACTION_MODE!r}.")
+        extraction_mode = DEFAULT_EXTRACTION_MODE
+
+    result = TweetScrapeResult(url=tweet_url)
+    started = phase_started = time.monotonic()
+
+    def end_phase(name: str):
+        nonlocal phase_started
+        now = time.monotonic()
+        result.timings[name] = round(now - phase_started, 3)
+        phase_started = now
+
     usernames = set()
+    collector = None
+    target_handles = set(target_handles or ())
+
+    async def all_targets_found() -> bool:
+        if not target_handles:
+            return False
+        return not await _missing_targets(page, collector, target_handles)
+
     page = await context.new_page()
+    if extraction_mode == "graphql":
+        # Subscribe before navigating so the first page of replies is not missed.
+        collector = TweetDetailCollector(extract_tweet_id(tweet_url))
+        collector.attach(page)
     try:
         await page.goto(tweet_url, wait_until="domcontentloaded", timeout=30000)
         await page.wait_for_selector('article[data-testid="tweet"]', timeout=30000)
+        await page.evaluate(_INSTALL_HARVESTER_JS, {"focalId": extract_tweet_id(tweet_url)})
         await human_wait()
+        end_phase("navigate")
 
         print("Scrolling to load initial comments...")
-        for i in range(5):
-            await page.evaluate("window.scrollBy(0, document.body.scrollHeight)")
-            await human_wait(1.5, 2.5)
+        rounds, result.stop_reason = await scroll_until_stable(
+            page, collector=collector, is_done=all_targets_found, result=result)
+        print(
+            f"Stopped scrolling after {rounds} scroll(s): {result.stop_reason}.")
+        end_phase("scroll")
 
-        # --- UPGRADED: CLICK-TO-REVEAL LOGIC ---
         try:
-            # PART 1: Click all "Show more replies" buttons in a loop
-            print("Looking for 'Show more replies' buttons...")
-            while True:
-                show_more_button = page.locator(
-                    'div[role="button"]:has-text("Show more replies")')
-                if await show_more_button.count() == 0:
-                    show_more_button = page.locator(
-                        'div[role="button"]:has-text("Show")')
-
-                if await show_more_button.count() > 0:
-                    print("Found 'Show more' button, clicking to reveal...")
-                    await show_more_button.first.click()
-                    await human_wait(2.0, 3.0)  # Wait for new comments to load
-                else:
-                    print("No more 'Show more' buttons found.")
-                    break
-
-            # PART 2: Specifically look for and click the "Show probable spam" link
-            print("Looking for a 'Show probable spam' link...")
-            # Playwright's get_by_text is perfect for this. It finds the element with that exact text.
-            spam_link = page.get_by_text("Show probable spam")
-
-            # Check if the element is actually visible on the page before trying to click
-            if await spam_link.count() > 0 and await spam_link.is_visible():
-                print("Found 'Show probable spam', clicking to reveal...")
-                await spam_link.click()
-                # Wait for the spam comments to load
-                await human_wait(2.0, 3.0)
-            else:
-                print("No 'Show probable spam' link found.")
-
+            if result.stop_reason == STOP_ALL_TARGETS_FOUND:
+                raise _AllTargetsFound()
+            reveal_rounds = await reveal_all_replies(
+                page, collector=collector, is_done=all_targets_found, result=result)
+            print(
+                f"Finished revealing after {reveal_rounds} round(s) and {result.clicks} click(s).")
+        except _AllTargetsFound:
+            print("Every target participant was found. Skipping the remaining reveals.")
+            result.stop_reason = STOP_ALL_TARGETS_FOUND
         except Exception as e:
             # This is not a critical error, as these buttons won't always exist.
             print(
                 f"Could not click a reveal button (this is normal if none exist): {e}")
-        # --- END OF UPGRADED LOGIC ---
+        end_phase("reveal")
 
         print("Finished revealing comments. Now extracting all handles...")
-        all_tweets = page.locator('article[data-testid="tweet"]')
-        count = await all_tweets.count()
-        print(f"Found {count} total tweet/comment articles on the page.")
-
-        if count > 1:
-            for i in range(1, count):
-                comment_article = all_tweets.nth(i)
-                try:
-                    user_link_locator = comment_article.locator(
-                        'div[data-testid="User-Name"] a[href^="/"][role="link"]')
-                    if await user_link_locator.count() > 0:
-                        href = await user_link_locator.first.get_attribute("href")
-                        if href:
-                            handle = f"@{href.lstrip('/')}".lower()
-                            usernames.add(handle)
-                except Exception:
-                    continue
+        usernames.update(await page.evaluate(_COLLECT_HANDLES_JS))
+        if result.stop_reason != STOP_ALL_TARGETS_FOUND and target_handles and await all_targets_found():
+            result.stop_reason = STOP_ALL_TARGETS_FOUND
+        end_phase("extract")
 
     except Exception as e:
         print(f"An error occurred while scraping {tweet_url}: {e}")
+        if type(e).__name__ == "TimeoutError":
+            result.timeouts += 1
+        result.error = str(e)
+        result.stop_reason = STOP_ERROR
+        # Keep whatever the harvester recorded before the failure.
+        try:
+            usernames.update(await page.evaluate(_COLLECT_HANDLES_JS))
+        except Exception:
+            pass
     finally:
+        if collector is not None:
+            await collector.drain()
+            result.rate_limited = collector.rate_limited
         await page.close()
+        result.timings["total"] = round(time.monotonic() - started, 3)
+
+    if collector is not None and collector.pages_parsed > 0:
+        print(
+            f"Parsed {collector.pages_parsed} TweetDetail response(s) for {tweet_url}.")
+        # The DOM harvester is nearly free, so whatever it saw is added too.
+        result.handles = collector.handles | usernames
+        result.cursors = collector.cursors
+        result.newest_reply_id = collector.newest_reply_id
+        result.source = "graphql"
+    elif usernames:
+        result.handles = usernames
+        result.source = "dom"
 
-    if usernames:
+    if result.handles:
         print(
-            f"✅ Success! Extracted {len(usernames)} unique handles from {tweet_url}.")
+            f"✅ Success! Extracted {len(result.handles)} unique handles from {tweet_url} ({result.source}).")
     else:
         print(f"⚠️ No handles were extracted from {tweet_url}.")
 
-    return usernames
+    return result
+
 
+class _AllTargetsFound(Exception):
+    """Used to leave the reveal stage early once every target has been seen."""
 
-async def run_scrape_and_check(participant_ids: list, tweet_urls: list, target_usernames: list) -> str:
+
+async def scrape_in_new_context(pool, tweet_url: str, storage_state,
+                                target_handles=None) -> TweetScrapeResult:
+    """
+    Scrapes one tweet in a fresh context created from `storage_state` (a parsed
+    storage-state dict or a file path), with lean mode applied when enabled.
+    While memory is short, fewer of these run at once (see resource_monitor).
+    Never raises; failures are returned as a result with an error.
+    """
+    async with resource_monitor.memory_gate.slot():
+        return await _scrape_in_context(pool, tweet_url, storage_state, target_handles)
+
+
+async def _scrape_in_context(pool, tweet_url: str, storage_state,
+                             target_handles) -> TweetScrapeResult:
+    context = None
+    try:
+        context = await pool.new_context(storage_state=storage_state)
+        if env_int("SCRAPER_LEAN_MODE", DEFAULT_LEAN_MODE):
+            stats = await enable_lean_mode(
+                context, extra_hosts=[urlparse(tweet_url).hostname])
+        else:
+            stats = None
+        result = await scrape_single_tweet(context, tweet_url, target_handles=target_handles)
+        if stats is not None:
+            result.blocked_requests = dict(stats.blocked_by_type)
+            result.bytes_saved_estimate = stats.bytes_saved_estimate
+            print(f"Lean mode for {tweet_url}: {stats.summary()}")
+        return result
+    except Exception as e:
+        print(f"Could not scrape {tweet_url}: {e}")
+        return TweetScrapeResult(url=tweet_url, error=str(e), stop_reason=STOP_ERROR)
+    finally:
+        if context is not None:
+            await context.close()
+
+
+async def scrape_tweet_http(tweet_url: str, storage_state, target_handles=None,
+                            max_pages: int = None) -> TweetScrapeResult:
+    """
+    Reads a tweet's reply authors straight from the TweetDetail endpoint,
+    following every reply cursor until none is left, all targets are found,
+    or `max_pages` pages were fetched.
+    Never raises; failures are returned as a result with an error.
+    """
+    if max_pages is None:
+        max_pages = env_int("HTTP_SCRAPE_MAX_PAGES", DEFAULT_HTTP_MAX_PAGES)
+    result = TweetScrapeResult(url=tweet_url, source="http")
+    started = time.monotonic()
+    tweet_id = extract_tweet_id(tweet_url)
+    target_handles = set(target_handles or ())
+
+    pending = [None]
+    seen_cursors = set()
+    pages = 0
+    try:
+        if not tweet_id:
+            raise ValueError("The URL has no tweet ID.")
+        async with http_backend.TweetDetailClient(storage_state) as client:
+            while True:
+                if not pending:
+                    result.stop_reason = STOP_CONVERGED
+                    break
+                if pages >= max_pages:
+                    result.stop_reason = STOP_MAX_ROUNDS
+                    break
+                detail = parse_tweet_detail(
+                    await client.fetch(tweet_id, pending.pop(0)), tweet_id)
+                pages += 1
+                result.handles |= detail.handles
+                result.cursors.update(detail.cursors)
+                result.newest_reply_id = max(
+                    result.newest_reply_id, detail.newest_reply_id)
+
+                if target_handles and target_handles <= result.handles:
+                    result.stop_reason = STOP_ALL_TARGETS_FOUND
+                    break
+                for cursor_type in REPLY_CURSOR_TYPES:
+                    value = detail.cursors.get(cursor_type)
+                    if value and value not in seen_cursors:
+                        seen_cursors.add(value)
+                        pending.append(value)
+    except http_backend.RateLimitedError as e:
+        result.rate_limited = True
+        result.error = str(e)
+        result.stop_reason = STOP_ERROR
+    except Exception as e:
+        result.error = str(e)
+        result.stop_reason = STOP_ERROR
+
+    result.timings["fetch"] = result.timings["total"] = round(
+        time.monotonic() - started, 3)
+    print(f"HTTP extraction of {tweet_url}: {len(result.handles)} handles from {pages} page(s), "
+          f"stopped: {result.stop_reason}.")
+    return result
+
+
+def _scraper_backend() -> str:
+    backend = os.getenv("SCRAPER_BACKEND", DEFAULT_SCRAPER_BACKEND)
+    if backend not in SCRAPER_BACKENDS:
+        print(
+            f"Unknown scraper backend {backend!r}, using {DEFAULT_SCRAPER_BACKEND!r}.")
+        return DEFAULT_SCRAPER_BACKEND
+    return backend
+
+
+def uses_warm_browser() -> bool:
+    """Whether a long-lived browser pool pays off. The HTTP backend starts one only for fallbacks."""
+    return _scraper_backend() != "http"
+
+
+@asynccontextmanager
+async def _browser_pool_for_backend():
+    """Yields a browser pool, or None with the HTTP backend (a browser is then only started for fallbacks)."""
+    if _scraper_backend() == "http":
+        yield None
+        return
+    async with acquire_pool() as pool:
+        yield pool
+
+
+async def scrape_with_backend(pool, tweet_url: str, storage_state,
+                              target_handles=None) -> TweetScrapeResult:
+    """
+    Scrapes one tweet with the configured backend. A failed HTTP scrape is
+    retried in the browser, except when it was rate-limited. `pool` may be
+    None, in which case a browser pool is acquired only if one is needed.
     """
-    Orchestrates scraping and checking with case-insensitive matching.
+    if _scraper_backend() == "http":
+        result = await scrape_tweet_http(tweet_url, storage_state, target_handles)
+        if not result.error or result.rate_limited:
+            return result
+        print(
+            f"HTTP extraction failed for {tweet_url} ({result.error}); falling back to the browser.")
+    if pool is None:
+        async with acquire_pool() as pool:
+            return await scrape_in_new_context(pool, tweet_url, storage_state, target_handles)
+    return await scrape_in_new_context(pool, tweet_url, storage_state, target_handles)
+
+
+async def scrape_task(tweet_url: str, storage_state, target_handles=None) -> TweetScrapeResult:
+    """Scrapes a single task handed out by the coordinator (remote workers)."""
+    async with _browser_pool_for_backend() as pool:
+        return await scrape_with_backend(pool, tweet_url, storage_state,
+                                         target_handles=target_handles)
+
+
+def session_outcome(result: TweetScrapeResult) -> str:
+    """Maps a scrape result to the outcome reported to the auth session pool."""
+    if result.rate_limited:
+        return session_pool.OUTCOME_RATE_LIMITED
+    if result.error:
+        return session_pool.OUTCOME_ERROR
+    if not result.handles:
+        return session_pool.OUTCOME_EMPTY
+    return session_pool.OUTCOME_OK
+
+
+async def _scrape_url_limited(semaphore: asyncio.Semaphore, pool, tweet_url: str, auth_files: list,
+                              target_handles: set = None) -> TweetScrapeResult:
+    """
+    Scrapes one URL in a fresh context once a slot in the semaphore is free,
+    using the healthiest auth session available among `auth_files`.
+    A cached snapshot is returned without scraping when it already contains
+    every target handle (or, without targets, while it is fresh). Otherwise
+    the tweet is scraped in full: the snapshot only says who had replied, not
+    who replied since. Any failure is contained here so one bad link never
+    affects the others.
     """
-    all_auth_files = []
-    for user_id in participant_ids:
-        user_auth_dir = f"user_data/{user_id}/"
-        if os.path.exists(user_auth_dir):
-            all_auth_files.extend(
-                [os.path.join(user_auth_dir, f) for f in os.listdir(
-                    user_auth_dir) if f.endswith('.json')]
-            )
+    tweet_id = extract_tweet_id(tweet_url)
+    cached = None
+    if tweet_id:
+        try:
+            cached = reply_cache.get_cached_replies(tweet_id)
+        except Exception as e:
+            print(f"Could not read the reply cache for {tweet_url}: {e}")
+    if cached and target_handles and target_handles <= cached["handles"]:
+        print(
+            f"Every target was already in the cached replies for {tweet_url}.")
+        return TweetScrapeResult(url=tweet_url, handles=cached["handles"], source="cache",
+                                 stop_reason=STOP_ALL_TARGETS_CACHED)
+    if (cached and not target_handles and cached["age_seconds"]
+            < env_int("REPLY_CACHE_TTL_SECONDS", reply_cache.DEFAULT_FRESH_TTL_SECONDS)):
+        print(
+            f"Using cached replies for {tweet_url} ({cached['age_seconds']}s old).")
+        return TweetScrapeResult(url=tweet_url, handles=cached["handles"], source="cache",
+                                 stop_reason=STOP_CACHE_FRESH)
+    known_handles = cached["handles"] if cached else None
+    # Targets already seen replying need not be looked for again.
+    remaining_targets = target_handles - \
+        known_handles if target_handles and known_handles else target_handles
+
+    async with semaphore:
+        try:
+            async with session_pool.shared_session_pool.session(auth_files) as lease:
+                print(
+                    f"--- Attempting to use storage state from: {lease.auth_file} ---")
+                try:
+                    storage_state = await session_pool.storage_state_cache.load(
+                        lease.auth_file)
+                except Exception as e:
+                    print(
+                        f"Could not load the storage state {lease.auth_file}: {e}")
+                    result = TweetScrapeResult(
+                        url=tweet_url, error=str(e), stop_reason=STOP_ERROR)
+                else:
+                    try:
+                        result = await scrape_with_backend(pool, tweet_url, storage_state,
+                                                           remaining_targets)
+                    except Exception as e:
+                        # e.g. the browser for an HTTP fallback could not be launched.
+                        print(f"Scraping {tweet_url} failed: {e}")
+                        result = TweetScrapeResult(
+                            url=tweet_url, error=str(e), stop_reason=STOP_ERROR)
+                result.auth_file = lease.auth_file
+                lease.outcome = session_outcome(result)
+                lease.error = result.error
+        except session_pool.NoHealthySessionError as e:
+            print(f"Skipping {tweet_url}: {e}")
+            result = TweetScrapeResult(
+                url=tweet_url, error=str(e), stop_reason=STOP_NO_SESSION)
 
+    if known_handles:
+        # Replies are rarely deleted, so handles seen before still count.
+        result.handles = result.handles | known_handles
+    # Only a scrape that read the whole reply list is a complete snapshot.
+    if tweet_id and result.handles and result.stop_reason == STOP_CONVERGED:
+        try:
+            reply_cache.store_replies(tweet_id, result.handles)
+        except Exception as e:
+            print(f"Could not update the reply cache for {tweet_url}: {e}")
+    return result
+
+
+# Returned instead of a report when no participant has uploaded an auth file.
+NO_AUTH_FILES_REPORT = "❌ **Error:** No authentication files found for any of the raid participants. Cannot perform verification."
+
+
+def _resolve_concurrency(max_concurrent_pages: int = None) -> int:
+    if max_concurrent_pages is None:
+        if _scraper_backend() == "http":
+            max_concurrent_pages = env_int(
+                "SCRAPER_HTTP_CONCURRENCY", DEFAULT_HTTP_CONCURRENT_REQUESTS)
+        else:
+            max_concurrent_pages = env_int(
+                "SCRAPER_MAX_CONCURRENT_PAGES", DEFAULT_MAX_CONCURRENT_PAGES)
+    return max(1, max_concurrent_pages)
+
+
+async def run_verification_tasks(raid_id: int, participant_ids: list, target_usernames: list,
+                                 worker_id: str = None, max_concurrent_pages: int = None) -> int:
+    """
+    Works through the queued verification tasks of a raid: claims one URL at a
+    time from the database, scrapes it and checkpoints its result immediately,
+    so an interrupted verification resumes from the last finished URL.
+    Returns the number of tasks this call processed.
+    """
+    if worker_id is None:
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    all_auth_files = database.get_auth_files_for_users(participant_ids)
     if not all_auth_files:
-        return "❌ **Error:** No authentication files found for any of the raid participants. Cannot perform verification."
+        print(f"No auth files for raid {raid_id}; leaving its tasks queued.")
+        return 0
 
-    found_handles_by_url = defaultdict(set)
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True, args=["--disable-blink-features=AutomationControlled", "--no-sandbox"])
+    concurrency = _resolve_concurrency(max_concurrent_pages)
+    semaphore = asyncio.Semaphore(concurrency)
+    target_handles = {handle.lower() for handle in target_usernames}
+    processed = 0
 
-        for i, url in enumerate(tweet_urls):
-            auth_file_to_use = random.choice(all_auth_files)
-            print(
-                f"--- Attempting to use storage state from: {auth_file_to_use} ---")
+    async def claim_loop(pool):
+        nonlocal processed
+        while True:
+            task = database.claim_verification_task(raid_id, worker_id, TASK_LEASE_SECONDS)
+            if task is None:
+                return
+            task_id, url = task
+            renewal = asyncio.ensure_future(_renew_task_lease(task_id, worker_id))
+            try:
+                result = await _scrape_url_limited(semaphore, pool, url, all_auth_files, target_handles)
+            finally:
+                renewal.cancel()
+            if not record_task_result(task_id, worker_id, result):
+                print(f"Discarding the result of task {task_id}: its lease was lost.")
+            processed += 1
 
-            context = await browser.new_context(storage_state=auth_file_to_use)
-            # The returned set from this function now contains ONLY lowercase handles
-            handles_from_tweet = await scrape_single_tweet(context, url)
-            found_handles_by_url[url] = handles_from_tweet
-            await context.close()
+    async with _browser_pool_for_backend() as pool:
+        await asyncio.gather(*[claim_loop(pool) for _ in range(concurrency)])
+    return processed
 
-    # --- REVISED CROSS-REFERENCING LOGIC ---
-    # We will store counts against the user's ORIGINAL handle for the report.
-    user_comment_counts = Counter()
-    for target_handle in target_usernames:
-        # For the check, convert the target handle to lowercase.
-        target_handle_lower = target_handle.lower()
-
-        for found_handles_set in found_handles_by_url.values():
-            # Now we compare a lowercase handle to a set of lowercase handles.
-            if target_handle_lower in found_handles_set:
-                # But we increment the counter for the original, properly capitalized handle.
-                user_comment_counts[target_handle] += 1
-
-    # --- The report generation remains the same ---
-    total_links_checked = len(tweet_urls)
-    report = f"✅ **Verification Report** ✅\n\nChecked **{total_links_checked}** random links. The following raid participants were found:\n\n"
-
-    found_users = sorted([handle for handle, count in user_comment_counts.items(
-    ) if count > 0], key=lambda x: user_comment_counts[x], reverse=True)
-
-    if found_users:
-        for handle in found_users:
-            count = user_comment_counts[handle]
-            report += f" • `{handle}` - Commented on **{count} of {total_links_checked}** links.\n"
-    else:
-        report += "_None of the participants were found in the comments._\n"
 
-    report += "\n"
+async def _renew_task_lease(task_id: int, worker_id: str):
+    """Keeps a claimed task leased until cancelled, so no other worker takes it over."""
+    while True:
+        await asyncio.sleep(TASK_LEASE_SECONDS / 3)
+        database.extend_verification_lease(task_id, worker_id, TASK_LEASE_SECONDS)
+
 
-    not_found_users = [
-        handle for handle in target_usernames if user_comment_counts[handle] == 0]
+def record_task_result(task_id: int, worker_id: str, result: TweetScrapeResult) -> bool:
+    """
+    Checkpoints a task's result; failed scrapes go back in the queue for a
+    retry. A task that got no auth session was never tried, so it is handed
+    back without using up an attempt. Returns False if the task was no longer
+    leased to `worker_id` (it expired and was reassigned), in which case the
+    result is stale and nothing is written.
+    """
+    metrics.log_scrape(result, task_id=task_id)
+    result_json = json.dumps(result.to_dict())
+    if result.stop_reason == STOP_NO_SESSION:
+        return database.release_verification_task(task_id, worker_id)
+    if result.stop_reason == STOP_ERROR:
+        return database.fail_verification_task(task_id, worker_id, result_json)
+    return database.complete_verification_task(task_id, worker_id, result_json)
 
-    if not_found_users:
-        report += f"❌ **Participants NOT Found:**\n"
-        for handle in not_found_users:
-            report += f" • `{handle}`\n"
 
-    return report
+def load_task_results(task_rows) -> list:
+    """Turns verification_tasks rows (url, status, result_json) into TweetScrapeResults."""
+    results = []
+    for url, status, result_json in task_rows:
+        if result_json:
+            results.append(TweetScrapeResult.from_dict(json.loads(result_json)))
+        else:
+            results.append(TweetScrapeResult(
+                url=url, error=f"task {status}", stop_reason=STOP_ERROR))
+    return results
@@ -0,0 +1,307 @@
+# session_pool.py
+# Health-scored pool of uploaded auth sessions (Playwright storage-state files).
+# Health scores are kept per process; the page limit and cooldowns of each
+# session are shared by every scraper process through the database, which is
+# always accessed through async_database so the event loop never waits on disk.
+import asyncio
+import json
+import os
+import random
+import socket
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from config import env_float, env_int
+import async_database
+
+# Outcomes reported back to the pool after a scrape.
+OUTCOME_OK = "ok"
+OUTCOME_EMPTY = "empty"            # the page loaded but no handles came back
+OUTCOME_ERROR = "error"
+OUTCOME_RATE_LIMITED = "rate_limited"
+
+DEFAULT_MAX_PAGES_PER_SESSION = 1
+DEFAULT_RATE_LIMIT_COOLDOWN = 300.0
+MAX_RATE_LIMIT_COOLDOWN = 3600.0
+DEFAULT_ERROR_COOLDOWN = 60.0
+# Consecutive failures before a session is put on the error cooldown.
+ERRORS_BEFORE_COOLDOWN = 2
+DEFAULT_ACQUIRE_TIMEOUT = 120.0
+# A lease held by a process that died without releasing it expires after this long.
+SESSION_LEASE_SECONDS = 1800
+# Sessions freed by other processes are noticed within this many seconds.
+SHARED_POLL_SECONDS = 1.0
+
+# Identifies this process's leases in the database.
+_HOLDER = f"{socket.gethostname()}:{os.getpid()}"
+DEFAULT_STATE_CACHE_SIZE = 1000
+
+
+class NoHealthySessionError(Exception):
+    """Raised when every session stays unavailable for the whole acquire timeout."""
+
+
+class SessionHealth:
+    """Running health statistics for one auth session."""
+
+    def __init__(self, auth_file: str):
+        self.auth_file = auth_file
+        self.successes = 0
+        self.empty_results = 0
+        self.failures = 0
+        self.rate_limits = 0
+        self.consecutive_failures = 0
+        self.consecutive_rate_limits = 0
+        self.total_latency = 0.0
+        self.in_flight = 0
+        self.last_error_at = None
+        self.cooldown_until = 0.0
+        # Database leases held by this process, one per page in flight.
+        self.lease_ids = []
+
+    @property
+    def attempts(self) -> int:
+        return self.successes + self.empty_results + self.failures + self.rate_limits
+
+    @property
+    def success_rate(self) -> float:
+        # Laplace smoothing: an unused session starts at 0.5 instead of 0 or 1.
+        # Empty results count as half a failure; the tweet may simply have no replies.
+        return (self.successes + 0.5 * self.empty_results + 1) / (self.attempts + 2)
+
+    @property
+    def average_latency(self) -> float:
+        return self.total_latency / self.attempts if self.attempts else 0.0
+
+    def is_cooling_down(self, now: float = None) -> bool:
+        return (now or time.time()) < self.cooldown_until
+
+    def score(self) -> float:
+        """Higher is better. Favors reliable, fast and currently idle sessions."""
+        latency_factor = 1.0 / (1.0 + self.average_latency / 30.0)
+        return self.success_rate * latency_factor / (1 + self.in_flight)
+
+    def describe(self) -> str:
+        return (f"{self.auth_file}: {self.success_rate:.0%} ok over {self.attempts} run(s), "
+                f"{self.average_latency:.1f}s avg, {self.in_flight} in flight")
+
+
+class AuthSessionPool:
+    """
+    Assigns auth sessions to scrapes. Each session runs at most
+    `max_pages_per_session` pages at once, sessions that were rate-limited or
+    keep failing are cooled down, and healthier sessions are preferred.
+    """
+
+    def __init__(self, max_pages_per_session: int = None):
+        self.max_pages_per_session = max_pages_per_session
+        self._sessions = {}
+        self._condition = asyncio.Condition()
+
+    def _limit(self) -> int:
+        if self.max_pages_per_session is None:
+            return max(1, env_int("AUTH_MAX_PAGES_PER_SESSION", DEFAULT_MAX_PAGES_PER_SESSION))
+        return max(1, self.max_pages_per_session)
+
+    def register(self, auth_files) -> list:
+        """Makes sure every file has a health record. Returns the records."""
+        sessions = []
+        for auth_file in auth_files:
+            if auth_file not in self._sessions:
+                self._sessions[auth_file] = SessionHealth(auth_file)
+            sessions.append(self._sessions[auth_file])
+        return sessions
+
+    def get(self, auth_file: str):
+        return self._sessions.get(auth_file)
+
+    async def _pick(self, candidates: list):
+        """Leases the healthiest session that is free in every process, or returns None."""
+        now = time.time()
+        limit = self._limit()
+        # Cooldowns started by other processes apply here too.
+        shared_cooldowns = await async_database.get_auth_session_cooldowns(
+            [s.auth_file for s in candidates])
+        for s in candidates:
+            s.cooldown_until = max(s.cooldown_until, shared_cooldowns.get(s.auth_file, 0.0))
+        available = [s for s in candidates
+                     if s.in_flight < limit and not s.is_cooling_down(now)]
+        # A little jitter spreads load between sessions with similar scores.
+        available.sort(key=lambda s: s.score() * random.uniform(0.9, 1.1), reverse=True)
+        for s in available:
+            lease_id = await async_database.try_lease_auth_session(
+                s.auth_file, _HOLDER, limit, SESSION_LEASE_SECONDS)
+            if lease_id is not None:
+                s.lease_ids.append(lease_id)
+                return s
+        return None
+
+    async def acquire(self, auth_files, timeout: float = None,
+                      wait_while_busy: bool = True) -> SessionHealth:
+        """
+        Waits for the healthiest available session among `auth_files`.
+        A session that is only busy will be free once its page finishes, so
+        the timeout runs only while every candidate is cooling down (or, with
+        `wait_while_busy=False`, from the start).
+        """
+        if timeout is None:
+            timeout = env_float("AUTH_ACQUIRE_TIMEOUT", DEFAULT_ACQUIRE_TIMEOUT)
+        candidates = self.register(auth_files)
+        if not candidates:
+            raise NoHealthySessionError("No auth sessions were provided.")
+
+        deadline = None if wait_while_busy else time.time() + timeout
+        async with self._condition:
+            while True:
+                session = await self._pick(candidates)
+                if session is not None:
+                    session.in_flight += 1
+                    return session
+
+                now = time.time()
+                cooldowns = [s.cooldown_until - now for s in candidates
+                             if s.is_cooling_down(now)]
+                if wait_while_busy:
+                    if len(cooldowns) < len(candidates):
+                        deadline = None
+                    elif deadline is None:
+                        deadline = now + timeout
+                remaining = deadline - now if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    raise NoHealthySessionError(
+                        "Every auth session is cooling down." if wait_while_busy
+                        else "Every auth session is busy or cooling down.")
+                # Wake up when a session is released here, the next cooldown
+                # ends, or another process may have released one.
+                wait_for = min(([remaining] if remaining is not None else [])
+                               + cooldowns + [SHARED_POLL_SECONDS])
+                try:
+                    await asyncio.wait_for(self._condition.wait(), timeout=max(wait_for, 0.05))
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self, session: SessionHealth, outcome: str, latency: float = 0.0, error: str = None):
+        """Records the outcome of a scrape and frees the session's slot."""
+        async with self._condition:
+            session.in_flight = max(0, session.in_flight - 1)
+            if session.lease_ids:
+                await async_database.release_auth_session_lease(session.lease_ids.pop())
+            session.total_latency += latency
+            now = time.time()
+            cooldown_before = session.cooldown_until
+
+            if outcome == OUTCOME_OK:
+                session.successes += 1
+                session.consecutive_failures = 0
+                session.consecutive_rate_limits = 0
+            elif outcome == OUTCOME_EMPTY:
+                session.empty_results += 1
+            elif outcome == OUTCOME_RATE_LIMITED:
+                session.rate_limits += 1
+                session.consecutive_rate_limits += 1
+                session.last_error_at = now
+                base = env_float("AUTH_RATE_LIMIT_COOLDOWN",
+                                 DEFAULT_RATE_LIMIT_COOLDOWN)
+                cooldown = min(
+                    base * 2 ** (session.consecutive_rate_limits - 1), MAX_RATE_LIMIT_COOLDOWN)
+                session.cooldown_until = now + cooldown
+                print(
+                    f"Auth session {session.auth_file} was rate-limited. Cooling down for {cooldown:.0f}s.")
+            else:
+                session.failures += 1
+                session.consecutive_failures += 1
+                session.last_error_at = now
+                if session.consecutive_failures >= ERRORS_BEFORE_COOLDOWN:
+                    session.cooldown_until = now + env_float(
+                        "AUTH_ERROR_COOLDOWN", DEFAULT_ERROR_COOLDOWN)
+                    print(
+                        f"Auth session {session.auth_file} failed {session.consecutive_failures} times in a row ({error}). Cooling down.")
+
+            if session.cooldown_until > cooldown_before:
+                await async_database.set_auth_session_cooldown(
+                    session.auth_file, session.cooldown_until)
+            self._condition.notify_all()
+
+    @asynccontextmanager
+    async def session(self, auth_files, timeout: float = None):
+        """
+        Acquires a session for the block. The block should set
+        `lease.outcome` (defaults to error if it raises, ok otherwise).
+        """
+        session = await self.acquire(auth_files, timeout)
+        lease = SessionLease(session)
+        started = time.monotonic()
+        try:
+            yield lease
+        except BaseException as e:
+            lease.outcome = OUTCOME_ERROR
+            lease.error = str(e)
+            raise
+        finally:
+            await self.release(session, lease.outcome or OUTCOME_OK,
+                               time.monotonic() - started, lease.error)
+
+
+class SessionLease:
+    """Handed to the `session()` block so it can report how the scrape went."""
+
+    def __init__(self, session: SessionHealth):
+        self.session = session
+        self.auth_file = session.auth_file
+        self.outcome = None
+        self.error = None
+
+
+def _read_state(auth_file: str) -> dict:
+    with open(auth_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class StorageStateCache:
+    """
+    Size-bounded LRU cache of parsed storage-state dicts, keyed by file path,
+    so a context can be created without re-reading the JSON from disk.
+    """
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries
+        self._states = OrderedDict()
+
+    def _limit(self) -> int:
+        if self.max_entries is None:
+            return max(1, env_int("AUTH_STATE_CACHE_SIZE", DEFAULT_STATE_CACHE_SIZE))
+        return max(1, self.max_entries)
+
+    def put(self, auth_file: str, state: dict):
+        self._states[auth_file] = state
+        self._states.move_to_end(auth_file)
+        while len(self._states) > self._limit():
+            self._states.popitem(last=False)
+
+    def get(self, auth_file: str) -> dict:
+        """Returns the parsed state, loading it from disk on a miss."""
+        state = self._states.get(auth_file)
+        if state is not None:
+            self._states.move_to_end(auth_file)
+            return state
+        state = _read_state(auth_file)
+        self.put(auth_file, state)
+        return state
+
+    async def load(self, auth_file: str) -> dict:
+        """Like get(), for coroutines: a miss is read from disk on a worker thread."""
+        state = self._states.get(auth_file)
+        if state is not None:
+            self._states.move_to_end(auth_file)
+            return state
+        state = await asyncio.to_thread(_read_state, auth_file)
+        self.put(auth_file, state)
+        return state
+
+    def discard(self, auth_file: str):
+        self._states.pop(auth_file, None)
+
+
+# Health records live for the whole process so they carry over between raids.
+shared_session_pool = AuthSessionPool()
+storage_state_cache = StorageStateCache()
@@ -0,0 +1,24 @@
+# tests/conftest.py
+# The bot's modules live at the top of the repository, next to this folder.
+import asyncio
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import async_database  # noqa: E402
+import database  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Points database.py at a fresh, migrated database file for one test."""
+    monkeypatch.setattr(database, "DATABASE_FILE", str(tmp_path / "bot_data.db"))
+    database.clear_caches()
+    database.migrate_database()
+    yield database
+    # Closes the connections that async_database opened on its own thread.
+    asyncio.run(async_database.close())
+    database.close_connections()
+    database.clear_caches()
@@ -0,0 +1,143 @@
+# tests/test_coordinator.py
+# The claim/heartbeat/complete protocol between the coordinator and remote workers.
+import asyncio
+import json
+import pytest
+
+pytest.importorskip("playwright")
+pytest.importorskip("httpx")
+
+import coordinator  # noqa: E402
+import scraper  # noqa: E402
+import session_pool  # noqa: E402
+
+TOKEN = "secret"
+
+
+@pytest.fixture
+def raids(db, tmp_path, monkeypatch):
+    """Two raids with one participant and auth file each; returns {raid_id: (url, auth_file)}."""
+    monkeypatch.setattr(session_pool, "shared_session_pool",
+                        session_pool.AuthSessionPool(max_pages_per_session=1))
+    monkeypatch.setattr(coordinator, "SESSION_ACQUIRE_TIMEOUT", 0.1)
+    raids = {}
+    for user_id, handle in ((1, "@Alice"), (2, "@Bob")):
+        auth_file = tmp_path / f"auth_{user_id}.json"
+        auth_file.write_text(json.dumps({"cookies": [], "origins": [], "user": user_id}))
+        db.connect_user_profile(user_id, handle)
+        db.add_auth_file(user_id, str(auth_file))
+        raid_id = db.create_new_raid(-user_id, 0, 0)
+        url = f"https://x.com/{handle[1:]}/status/{user_id}"
+        db.add_raid_link_and_mark_submitted(raid_id, user_id, url)
+        db.create_verification_job(raid_id, -user_id, [url])
+        raids[raid_id] = (url, str(auth_file))
+    return raids
+
+
+class _Worker:
+    def __init__(self, reader, writer, worker_id):
+        self.reader, self.writer, self.worker_id = reader, writer, worker_id
+
+    async def call(self, op, token=TOKEN, **fields):
+        self.writer.write(json.dumps(
+            {"op": op, "token": token, "worker_id": self.worker_id, **fields}).encode() + b"\n")
+        await self.writer.drain()
+        return json.loads(await self.reader.readline())
+
+
+def _run(scenario):
+    """Runs `scenario(task_coordinator, connect)` against a coordinator on a free port."""
+    async def main():
+        task_coordinator = coordinator.TaskCoordinator(TOKEN)
+        await task_coordinator.start("127.0.0.1", 0)
+        port = task_coordinator._server.sockets[0].getsockname()[1]
+        workers = []
+
+        async def connect(worker_id):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            workers.append(writer)
+            return _Worker(reader, writer, worker_id)
+        try:
+            await scenario(task_coordinator, connect)
+        finally:
+            for writer in workers:
+                writer.close()
+            await task_coordinator.stop()
+    asyncio.run(main())
+
+
+def _done(url):
+    return scraper.TweetScrapeResult(url, {"@alice"}, stop_reason=scraper.STOP_CONVERGED).to_dict()
+
+
+def test_rejects_a_wrong_token(raids):
+    async def scenario(task_coordinator, connect):
+        worker = await connect("w1")
+        assert await worker.call("claim", token="wrong") == {"ok": False, "error": "invalid token"}
+        assert (await worker.call("dance"))["ok"] is False
+    _run(scenario)
+
+
+def test_claim_heartbeat_complete(raids, db):
+    async def scenario(task_coordinator, connect):
+        worker = await connect("w1")
+        tasks = []
+        for _ in raids:
+            response = await worker.call("claim")
+            assert response["ok"]
+            tasks.append(response["task"])
+        assert (await worker.call("claim")) == {"ok": True, "task": None}
+
+        task = tasks[0]
+        url, auth_file = raids[task["raid_id"]]
+        assert task["url"] == url
+        assert task["storage_state"]["user"] == 1
+        assert task["target_handles"] == ["@alice"]
+
+        assert await worker.call("heartbeat", task_id=task["task_id"]) == {
+            "ok": True, "still_assigned": True}
+        assert await worker.call("complete", task_id=task["task_id"], result=_done(url)) == {
+            "ok": True, "recorded": True}
+        assert db.get_verification_task_results(task["raid_id"])[0][1] == "done"
+        health = session_pool.shared_session_pool.get(auth_file)
+        assert health.successes == 1 and health.in_flight == 0
+    _run(scenario)
+
+
+def test_late_result_after_reassignment_is_discarded(raids, db):
+    # Lets the raid's only session serve the second worker before the sweep frees it.
+    session_pool.shared_session_pool.max_pages_per_session = 2
+
+    async def scenario(task_coordinator, connect):
+        first, second = await connect("w1"), await connect("w2")
+        task = (await first.call("claim"))["task"]
+        with db.get_connection() as conn:
+            conn.execute("UPDATE verification_tasks SET lease_expires_timestamp = 0 WHERE task_id = ?",
+                         (task["task_id"],))
+        retry = (await second.call("claim"))["task"]
+        assert retry["task_id"] == task["task_id"]
+        assert (await first.call("heartbeat", task_id=task["task_id"]))["still_assigned"] is False
+
+        assert (await second.call("complete", task_id=task["task_id"],
+                                  result=_done(task["url"])))["recorded"] is True
+        late = scraper.TweetScrapeResult(task["url"], error="timeout",
+                                         stop_reason=scraper.STOP_ERROR).to_dict()
+        assert (await first.call("complete", task_id=task["task_id"], result=late))["recorded"] is False
+        assert db.get_verification_task_results(task["raid_id"])[0][1] == "done"
+        _, auth_file = raids[task["raid_id"]]
+        assert session_pool.shared_session_pool.get(auth_file).in_flight == 0
+    _run(scenario)
+
+
+def test_raid_without_a_free_session_does_not_block_other_raids(raids, db):
+    first_raid, second_raid = sorted(raids)
+    # Another process holds the first raid's only session.
+    db.try_lease_auth_session(raids[first_raid][1], "other", 1, 60)
+
+    async def scenario(task_coordinator, connect):
+        worker = await connect("w1")
+        task = (await worker.call("claim"))["task"]
+        assert task["raid_id"] == second_raid
+        assert (await worker.call("claim"))["task"] is None
+        assert db.count_open_verification_tasks(first_raid) == 1
+    _run(scenario)
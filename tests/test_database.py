@@ -0,0 +1,181 @@
+# tests/test_database.py
+# The verification task queue: claims, leases, retries and the terminal states.
+import json
+
+RAID_ID = 7
+URLS = ["https://x.com/a/status/1", "https://x.com/b/status/2"]
+
+
+def _status(db, url):
+    with db.get_connection() as conn:
+        return conn.execute(
+            "SELECT status, attempts FROM verification_tasks WHERE url = ?", (url,)).fetchone()
+
+
+def test_migrations_bring_a_new_database_to_the_latest_version(db):
+    assert db.get_schema_version() == len(db.MIGRATIONS)
+    assert db.migrate_database() == 0
+
+
+def test_create_verification_job_is_idempotent(db):
+    assert db.create_verification_job(RAID_ID, 100, URLS) == URLS
+    assert db.create_verification_job(RAID_ID, 100, URLS + ["https://x.com/c/status/3"]) == URLS
+    assert db.count_open_verification_tasks(RAID_ID) == 2
+
+
+def test_claims_hand_out_each_task_once(db):
+    db.create_verification_job(RAID_ID, 100, URLS)
+    first = db.claim_verification_task(RAID_ID, "w1")
+    second = db.claim_verification_task(RAID_ID, "w2")
+    assert [first[1], second[1]] == URLS
+    assert db.claim_verification_task(RAID_ID, "w3") is None
+    assert _status(db, URLS[0]) == ("running", 1)
+
+
+def test_complete_closes_the_task(db):
+    db.create_verification_job(RAID_ID, 100, URLS[:1])
+    task_id, _ = db.claim_verification_task(RAID_ID, "w1")
+    db.complete_verification_task(task_id, "w1", json.dumps({"handles": ["@a"]}))
+    assert _status(db, URLS[0]) == ("done", 1)
+    assert db.count_open_verification_tasks(RAID_ID) == 0
+    assert db.get_verification_task_results(RAID_ID) == [
+        (URLS[0], "done", json.dumps({"handles": ["@a"]}))]
+
+
+def test_failed_task_is_retried_until_out_of_attempts(db):
+    db.create_verification_job(RAID_ID, 100, URLS[:1])
+    for attempt in range(1, db.MAX_VERIFICATION_ATTEMPTS + 1):
+        task_id, _ = db.claim_verification_task(RAID_ID, "w1")
+        db.fail_verification_task(task_id, "w1", "{}")
+        expected = "failed" if attempt == db.MAX_VERIFICATION_ATTEMPTS else "pending"
+        assert _status(db, URLS[0]) == (expected, attempt)
+    assert db.claim_verification_task(RAID_ID, "w1") is None
+    assert db.count_open_verification_tasks(RAID_ID) == 0
+
+
+def test_released_task_does_not_spend_an_attempt(db):
+    db.create_verification_job(RAID_ID, 100, URLS[:1])
+    task_id, _ = db.claim_verification_task(RAID_ID, "w1")
+    db.release_verification_task(task_id, "w1")
+    assert _status(db, URLS[0]) == ("pending", 0)
+
+
+def test_expired_lease_is_reclaimed(db):
+    db.create_verification_job(RAID_ID, 100, URLS[:1])
+    task_id, _ = db.claim_verification_task(RAID_ID, "w1", lease_seconds=-1)
+    assert db.claim_verification_task(RAID_ID, "w2") == (task_id, URLS[0])
+    assert _status(db, URLS[0]) == ("running", 2)
+    # The first worker lost the task, so its heartbeat must fail.
+    assert not db.extend_verification_lease(task_id, "w1")
+    assert db.extend_verification_lease(task_id, "w2")
+
+
+def test_late_result_of_a_reassigned_task_is_discarded(db):
+    db.create_verification_job(RAID_ID, 100, URLS[:1])
+    task_id, _ = db.claim_verification_task(RAID_ID, "w1", lease_seconds=-1)
+    db.claim_verification_task(RAID_ID, "w2")
+    assert db.complete_verification_task(task_id, "w2", json.dumps({"handles": ["@b"]}))
+    # w1 reports after its lease expired and w2 finished the task.
+    assert not db.fail_verification_task(task_id, "w1", json.dumps({"error": "late"}))
+    assert not db.complete_verification_task(task_id, "w1", "{}")
+    assert not db.release_verification_task(task_id, "w1")
+    assert db.get_verification_task_results(RAID_ID) == [
+        (URLS[0], "done", json.dumps({"handles": ["@b"]}))]
+    assert db.claim_any_verification_task("w3") is None
+
+
+def test_lease_expiring_on_the_last_attempt_fails_the_task(db):
+    db.create_verification_job(RAID_ID, 100, URLS[:1])
+    for _ in range(db.MAX_VERIFICATION_ATTEMPTS):
+        assert db.claim_verification_task(RAID_ID, "w1", lease_seconds=-1) is not None
+    assert _status(db, URLS[0]) == ("running", db.MAX_VERIFICATION_ATTEMPTS)
+    assert db.fail_exhausted_verification_tasks(RAID_ID) == 1
+    assert _status(db, URLS[0]) == ("failed", db.MAX_VERIFICATION_ATTEMPTS)
+    assert db.count_open_verification_tasks(RAID_ID) == 0
+
+
+def test_claim_closes_exhausted_tasks(db):
+    db.create_verification_job(RAID_ID, 100, URLS[:1])
+    for _ in range(db.MAX_VERIFICATION_ATTEMPTS):
+        db.claim_verification_task(RAID_ID, "w1", lease_seconds=-1)
+    assert db.claim_any_verification_task("w2") is None
+    assert _status(db, URLS[0]) == ("failed", db.MAX_VERIFICATION_ATTEMPTS)
+
+
+def test_release_running_tasks_after_a_crash(db):
+    db.create_verification_job(RAID_ID, 100, URLS)
+    db.claim_verification_task(RAID_ID, "w1")
+    for _ in range(db.MAX_VERIFICATION_ATTEMPTS):
+        db.claim_verification_task(RAID_ID, "w1", lease_seconds=-1)
+    assert db.release_running_verification_tasks() == 2
+    assert _status(db, URLS[0]) == ("pending", 1)
+    assert _status(db, URLS[1]) == ("failed", db.MAX_VERIFICATION_ATTEMPTS)
+
+
+def test_fail_open_tasks_gives_up_on_the_rest(db):
+    db.create_verification_job(RAID_ID, 100, URLS)
+    task_id, _ = db.claim_verification_task(RAID_ID, "w1")
+    db.complete_verification_task(task_id, "w1", "{}")
+    db.claim_verification_task(RAID_ID, "w1")
+    assert db.fail_open_verification_tasks(RAID_ID) == 1
+    assert [row[1] for row in db.get_verification_task_results(RAID_ID)] == ["done", "failed"]
+
+
+
+def test_claim_any_can_skip_raids(db):
+    db.create_verification_job(RAID_ID, 100, URLS[:1])
+    db.create_verification_job(RAID_ID + 1, 100, ["https://x.com/c/status/3"])
+    task = db.claim_any_verification_task("w1", skip_raid_ids={RAID_ID})
+    assert task[1:] == (RAID_ID + 1, "https://x.com/c/status/3")
+    assert db.claim_any_verification_task("w1", skip_raid_ids={RAID_ID, RAID_ID + 1}) is None
+    assert db.claim_any_verification_task("w1")[1] == RAID_ID
+
+
+def test_auth_session_leases_respect_the_limit_and_cooldowns(db):
+    first = db.try_lease_auth_session("a.json", "p1", 1, 60)
+    assert first is not None
+    assert db.try_lease_auth_session("a.json", "p2", 1, 60) is None
+    db.release_auth_session_lease(first)
+    assert db.try_lease_auth_session("a.json", "p2", 1, 60) is not None
+
+    db.set_auth_session_cooldown("b.json", 4102444800)
+    assert db.try_lease_auth_session("b.json", "p1", 1, 60) is None
+    assert db.get_auth_session_cooldowns(["a.json", "b.json"]) == {"b.json": 4102444800}
+
+
+def test_expired_auth_session_leases_are_dropped(db):
+    db.try_lease_auth_session("a.json", "crashed", 1, -1)
+    assert db.try_lease_auth_session("a.json", "p1", 1, 60) is not None
+
+
+def test_finished_tasks_since_a_timestamp(db):
+    db.create_verification_job(RAID_ID, 100, URLS)
+    task_id, _ = db.claim_verification_task(RAID_ID, "w1")
+    db.claim_verification_task(RAID_ID, "w1")
+    db.complete_verification_task(task_id, "w1", "{}")
+    rows = db.get_finished_verification_tasks(RAID_ID)
+    assert [(row[0], row[2], row[3]) for row in rows] == [(task_id, URLS[0], "done")]
+    assert db.get_finished_verification_tasks(RAID_ID, rows[0][1] + 1) == []
+
+
+def test_user_registration_cache_follows_connect_user_profile(db):
+    assert db.cached_user_registration(1) is None
+    assert db.is_user_registered(1) is False
+    assert db.cached_user_registration(1) is False
+    db.connect_user_profile(1, "@alice")
+    assert db.cached_user_registration(1) is True
+
+
+def test_active_raid_cache_follows_create_and_deactivate(db):
+    assert db.cached_active_raid_details(-100) is db.NOT_CACHED
+    assert db.get_active_raid_details(-100) is None
+    assert db.cached_active_raid_details(-100) is None
+
+    raid_id = db.create_new_raid(-100, 1000, 2000)
+    assert db.cached_active_raid_details(-100) is db.NOT_CACHED
+    assert db.get_active_raid_details(-100) == (raid_id, 1000, 2000)
+    assert db.cached_active_raid_details(-100) == (raid_id, 1000, 2000)
+
+    db.deactivate_raid(raid_id)
+    assert db.cached_active_raid_details(-100) is db.NOT_CACHED
+    assert db.get_active_raid_details(-100) is None
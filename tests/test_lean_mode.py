@@ -0,0 +1,44 @@
+# tests/test_lean_mode.py
+import pytest
+import lean_mode
+from lean_mode import LeanModeStats, should_block
+
+
+@pytest.mark.parametrize("url, resource_type", [
+    ("https://x.com/u/status/1", "document"),
+    ("https://abs.twimg.com/responsive-web/client-web/main.js", "script"),
+    ("https://x.com/i/api/graphql/abc/TweetDetail?variables={}", "fetch"),
+    ("https://api.twitter.com/1.1/onboarding/task.json", "xhr"),
+    ("data:text/css,body{}", "stylesheet"),
+])
+def test_needed_requests_are_allowed(url, resource_type):
+    assert not should_block(url, resource_type)
+
+
+@pytest.mark.parametrize("url, resource_type", [
+    ("https://pbs.twimg.com/profile_images/1/a.jpg", "image"),
+    ("https://video.twimg.com/clip.mp4", "media"),
+    ("https://abs.twimg.com/fonts/chirp.woff2", "font"),
+    ("https://www.google-analytics.com/collect", "script"),
+    ("https://notx.com/x.js", "script"),
+    ("https://x.com/i/api/1.1/jot/client_event.json", "xhr"),
+    ("https://x.com/i/api/1.1/promoted_content/log.json", "fetch"),
+])
+def test_unneeded_requests_are_blocked(url, resource_type):
+    assert should_block(url, resource_type)
+
+
+def test_extra_hosts_are_allowed():
+    assert should_block("http://127.0.0.1:8800/replay/status/1", "document")
+    assert not should_block("http://127.0.0.1:8800/replay/status/1", "document",
+                            extra_hosts=("127.0.0.1",))
+
+
+def test_stats_estimate_the_bytes_saved():
+    stats = LeanModeStats()
+    stats.record_blocked("image")
+    stats.record_blocked("ping")
+    assert stats.requests_blocked == 2
+    assert stats.blocked_by_type == {"image": 1, "ping": 1}
+    assert stats.bytes_saved_estimate == (lean_mode.ESTIMATED_BYTES_BY_TYPE["image"]
+                                          + lean_mode.DEFAULT_ESTIMATED_BYTES)
@@ -0,0 +1,63 @@
+# tests/test_metrics.py
+import urllib.request
+from types import SimpleNamespace
+import metrics
+
+
+def _result(**overrides):
+    # Only the attributes metrics.py reads from a TweetScrapeResult.
+    fields = dict(url="https://x.com/u/status/1", source="graphql", stop_reason="converged",
+                  handles={"@alice", "@bob"}, timings={"scroll": 1.5, "total": 3.0},
+                  clicks=2, timeouts=1, idle_rounds=3, blocked_requests={"image": 4},
+                  bytes_saved_estimate=120_000, rate_limited=False,
+                  auth_file="user_data/1/auth_1.json", error=None)
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+def test_counter_renders_one_line_per_label_set():
+    counter = metrics.Counter("test_total", "A test counter.")
+    counter.inc(source="dom")
+    counter.inc(2, source="dom")
+    counter.inc(source='say "hi"')
+    assert counter.render() == [
+        "# HELP test_total A test counter.",
+        "# TYPE test_total counter",
+        'test_total{source="dom"} 3',
+        'test_total{source="say \\"hi\\""} 1',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("test_seconds", "A test histogram.", buckets=(1, 5))
+    histogram.observe(0.5, phase="scroll")
+    histogram.observe(3, phase="scroll")
+    assert histogram.render()[2:] == [
+        'test_seconds_bucket{phase="scroll",le="1"} 1',
+        'test_seconds_bucket{phase="scroll",le="5"} 2',
+        'test_seconds_bucket{phase="scroll",le="+Inf"} 2',
+        'test_seconds_sum{phase="scroll"} 3.5',
+        'test_seconds_count{phase="scroll"} 2',
+    ]
+
+
+def test_observed_scrapes_appear_in_the_rendered_metrics():
+    metrics.observe_scrape(_result(source="test_source"), outcome="ok")
+    lines = metrics.render().splitlines()
+    assert 'scraper_pages_total{source="test_source",stop_reason="converged"} 1' in lines
+    assert 'scraper_lean_requests_blocked_total{resource_type="image"} ' in "\n".join(lines)
+    assert 'scraper_auth_file_pages_total{auth_file="user_data/1/auth_1.json",outcome="ok"}' \
+        in "\n".join(lines)
+    for metric in metrics.REGISTRY:
+        assert f"# TYPE {metric.name} " in "\n".join(lines)
+
+
+def test_metrics_endpoint():
+    metrics.start_metrics_server(0)
+    try:
+        port = metrics._server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert response.read().decode() == metrics.render()
+    finally:
+        metrics.stop_metrics_server()
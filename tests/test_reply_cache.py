@@ -0,0 +1,93 @@
+# tests/test_reply_cache.py
+import asyncio
+import pytest
+import reply_cache
+
+
+class _Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(tmp_path, monkeypatch):
+    """A fresh cache file and a clock the test moves by hand."""
+    clock = _Clock(1_000_000)
+    monkeypatch.setattr(reply_cache, "REPLY_CACHE_FILE", str(tmp_path / "reply_cache.db"))
+    monkeypatch.setattr(reply_cache, "_initialized", False)
+    monkeypatch.setattr(reply_cache, "time", clock)
+    monkeypatch.delenv("REPLY_CACHE_MAX_AGE_SECONDS", raising=False)
+    monkeypatch.delenv("REPLY_CACHE_MAX_ENTRIES", raising=False)
+    return clock
+
+
+def test_snapshot_reports_its_age(clock):
+    assert reply_cache.get_cached_replies("1") is None
+    reply_cache.store_replies("1", {"@alice", "@bob"})
+    clock.now += 120
+    assert reply_cache.get_cached_replies("1") == {"handles": {"@alice", "@bob"}, "age_seconds": 120}
+
+
+def test_storing_again_replaces_the_snapshot(clock):
+    reply_cache.store_replies("1", {"@alice"})
+    clock.now += 60
+    reply_cache.store_replies("1", {"@bob"})
+    assert reply_cache.get_cached_replies("1") == {"handles": {"@bob"}, "age_seconds": 0}
+
+
+def test_snapshots_older_than_the_max_age_are_evicted(clock):
+    reply_cache.store_replies("1", {"@alice"})
+    clock.now += reply_cache.DEFAULT_MAX_AGE_SECONDS + 1
+    reply_cache.store_replies("2", {"@bob"})
+    assert reply_cache.get_cached_replies("1") is None
+    assert reply_cache.get_cached_replies("2") is not None
+
+
+def test_least_recently_used_snapshots_are_evicted_first(clock, monkeypatch):
+    monkeypatch.setenv("REPLY_CACHE_MAX_ENTRIES", "2")
+    reply_cache.store_replies("1", {"@a"})
+    clock.now += 1
+    reply_cache.store_replies("2", {"@b"})
+    clock.now += 1
+    # Reading "1" makes "2" the least recently used entry.
+    reply_cache.get_cached_replies("1")
+    clock.now += 1
+    reply_cache.store_replies("3", {"@c"})
+    assert reply_cache.get_cached_replies("2") is None
+    assert reply_cache.get_cached_replies("1") is not None
+    assert reply_cache.get_cached_replies("3") is not None
+
+
+def _scrape_cached(url, target_handles):
+    """Runs the scraper's cache check; no auth files, so a cache miss ends as no_session."""
+    pytest.importorskip("playwright")
+    pytest.importorskip("httpx")
+    import scraper
+
+    return asyncio.run(scraper._scrape_url_limited(
+        asyncio.Semaphore(1), None, url, [], target_handles))
+
+
+def test_fresh_snapshot_is_reused_without_targets(clock, monkeypatch):
+    monkeypatch.delenv("REPLY_CACHE_TTL_SECONDS", raising=False)
+    reply_cache.store_replies("1", {"@alice"})
+    clock.now += reply_cache.DEFAULT_FRESH_TTL_SECONDS - 1
+    result = _scrape_cached("https://x.com/u/status/1", set())
+    assert (result.source, result.handles) == ("cache", {"@alice"})
+
+    clock.now += 2
+    result = _scrape_cached("https://x.com/u/status/1", set())
+    assert result.source != "cache"
+
+
+def test_stale_snapshot_is_reused_only_when_every_target_is_in_it(clock):
+    reply_cache.store_replies("1", {"@alice", "@bob"})
+    clock.now += reply_cache.DEFAULT_FRESH_TTL_SECONDS * 10
+    assert _scrape_cached("https://x.com/u/status/1", {"@alice"}).source == "cache"
+    result = _scrape_cached("https://x.com/u/status/1", {"@alice", "@carol"})
+    assert result.source != "cache"
+    # Handles seen before still count for a scrape that found nothing new.
+    assert result.handles == {"@alice", "@bob"}
@@ -0,0 +1,87 @@
+# tests/test_report.py
+# The progress updates and the verification report built from scrape results.
+import csv
+import io
+import json
+import pytest
+
+pytest.importorskip("playwright")
+pytest.importorskip("httpx")
+
+import report_writer  # noqa: E402
+from report_writer import ProgressTally, format_summary, summarize_results  # noqa: E402
+from scraper import STOP_CONVERGED, STOP_ERROR, TweetScrapeResult  # noqa: E402
+
+
+def _result(n, handles, stop_reason=STOP_CONVERGED, error=None):
+    return TweetScrapeResult(f"https://x.com/u/status/{n}", set(handles),
+                             stop_reason=stop_reason, error=error)
+
+
+def test_summary_matches_handles_case_insensitively():
+    results = [_result(1, {"@alice", "@stranger"}), _result(2, {"@alice", "@bob"})]
+    summary = summarize_results(results, ["@Alice", "@Bob", "@Carol"])
+    assert summary.links_checked == 2
+    assert summary.hit_counts == {"@Alice": 2, "@Bob": 1, "@Carol": 0}
+    assert summary.found_handles() == ["@Alice", "@Bob"]
+    assert summary.not_found_handles() == ["@Carol"]
+    assert summary.hits_by_url[results[0].url] == ["@Alice"]
+
+
+def test_format_summary_lists_participants_and_stop_reasons():
+    results = [_result(1, {"@alice"}), _result(2, set(), STOP_ERROR, error="boom")]
+    report = format_summary(summarize_results(results, ["@Alice", "@Bob"], sampled=False))
+    assert "Checked **2** links (all submitted)" in report
+    assert "`@Alice` - Commented on **1 of 2** links." in report
+    assert "**Participants NOT Found:** (1)" in report
+    assert f" 2. 0 handles, stopped: `{STOP_ERROR}`" in report
+    assert "attached file" not in report
+
+
+def test_format_summary_without_hits():
+    report = format_summary(summarize_results([_result(1, set())], ["@Alice"]),
+                            results_attached=True)
+    assert "Checked **1** random links" in report
+    assert "_None of the participants were found in the comments._" in report
+    assert report.endswith("📎 The full results are in the attached file.")
+
+
+def test_many_links_are_grouped_by_stop_reason():
+    results = [_result(n, set(), STOP_CONVERGED if n % 3 else STOP_ERROR)
+               for n in range(report_writer.MAX_PER_LINK_DETAILS + 2)]
+    report = format_summary(summarize_results(results, []))
+    assert f" • `{STOP_CONVERGED}`: 8 links" in report
+    assert f" • `{STOP_ERROR}`: 4 links" in report
+
+
+def test_long_reports_fit_in_one_message_and_attach_the_results(monkeypatch):
+    monkeypatch.delenv("VERIFICATION_ATTACH_RESULTS", raising=False)
+    targets = [f"@user{i:04d}" for i in range(3 * report_writer.MAX_REPORT_HANDLES)]
+    summary = summarize_results([_result(1, {handle.lower() for handle in targets[::2]})], targets)
+    report = format_summary(summary, results_attached=True)
+    assert len(report) <= report_writer.MAX_MESSAGE_CHARS
+    assert f"_…and {len(targets) // 2 - report_writer.MAX_REPORT_HANDLES} more._" in report
+    assert report_writer.needs_attachment(summary)
+
+
+def test_results_files_list_every_participant():
+    summary = summarize_results([_result(1, {"@alice"}), _result(2, set())], ["@Alice", "@Bob"])
+    document, filename = report_writer.build_results_file(summary, 9, "csv")
+    rows = list(csv.reader(io.TextIOWrapper(document, encoding="utf-8", newline="")))
+    assert filename == "raid_9_results.csv"
+    assert rows[1] == ["@Alice", "1", "2", "https://x.com/u/status/1"]
+    assert rows[2] == ["@Bob", "0", "2", ""]
+
+    document, filename = report_writer.build_results_file(summary, 9, "json")
+    data = json.loads(document.read())
+    assert filename == "raid_9_results.json"
+    assert data["participants"][0] == {"handle": "@Alice", "links_commented": 1}
+    assert len(data["links"]) == 2
+
+def test_progress_tally_counts_each_new_link_once():
+    tally = ProgressTally(["@Alice", "@Bob"], 5)
+    tally.add([_result(1, {"@alice", "@x"})])
+    tally.add([_result(2, set(), STOP_ERROR, error="boom")])
+    assert tally.text() == ("🔬 **Progress:** 2 of 5 links checked (1 failed).\n"
+                            "Found so far: `@Alice` (1).\n"
+                            "Not seen yet: 1 participant(s).\n")
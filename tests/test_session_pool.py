@@ -0,0 +1,120 @@
+# tests/test_session_pool.py
+import asyncio
+import pytest
+import session_pool
+from session_pool import (AuthSessionPool, NoHealthySessionError, OUTCOME_ERROR,
+                          OUTCOME_OK, OUTCOME_RATE_LIMITED)
+
+
+def test_acquire_leases_a_free_session(db):
+    async def scenario():
+        pool = AuthSessionPool(max_pages_per_session=1)
+        session = await pool.acquire(["a.json"])
+        assert session.auth_file == "a.json" and session.in_flight == 1
+        assert len(session.lease_ids) == 1
+        await pool.release(session, OUTCOME_OK, latency=2.0)
+        assert session.in_flight == 0 and session.lease_ids == []
+        assert session.successes == 1 and session.average_latency == 2.0
+    asyncio.run(scenario())
+
+
+def test_no_auth_files(db):
+    with pytest.raises(NoHealthySessionError):
+        asyncio.run(AuthSessionPool().acquire([]))
+
+
+def test_busy_session_fails_fast_without_waiting(db):
+    async def scenario():
+        pool = AuthSessionPool(max_pages_per_session=1)
+        await pool.acquire(["a.json"])
+        with pytest.raises(NoHealthySessionError):
+            await pool.acquire(["a.json"], timeout=0.1, wait_while_busy=False)
+    asyncio.run(scenario())
+
+
+def test_busy_session_is_waited_for(db):
+    async def scenario():
+        pool = AuthSessionPool(max_pages_per_session=1)
+        first = await pool.acquire(["a.json"])
+
+        async def finish_first():
+            await asyncio.sleep(0.1)
+            await pool.release(first, OUTCOME_OK)
+        releaser = asyncio.ensure_future(finish_first())
+        # The timeout only covers cooldowns, so a busy session is waited for.
+        second = await pool.acquire(["a.json"], timeout=0.01)
+        await releaser
+        assert second is first and first.in_flight == 1
+    asyncio.run(scenario())
+
+
+def test_rate_limited_session_cools_down(db):
+    async def scenario():
+        pool = AuthSessionPool(max_pages_per_session=1)
+        session = await pool.acquire(["a.json"])
+        await pool.release(session, OUTCOME_RATE_LIMITED, error="429")
+        assert session.is_cooling_down() and session.rate_limits == 1
+        with pytest.raises(NoHealthySessionError, match="cooling down"):
+            await pool.acquire(["a.json"], timeout=0.1)
+        other = await pool.acquire(["a.json", "b.json"])
+        assert other.auth_file == "b.json"
+    asyncio.run(scenario())
+
+
+def test_repeated_errors_trigger_a_cooldown(db):
+    async def scenario():
+        pool = AuthSessionPool(max_pages_per_session=1)
+        for _ in range(session_pool.ERRORS_BEFORE_COOLDOWN):
+            session = await pool.acquire(["a.json"])
+            assert not session.is_cooling_down()
+            await pool.release(session, OUTCOME_ERROR, error="boom")
+        assert session.is_cooling_down()
+    asyncio.run(scenario())
+
+
+def test_healthier_session_is_preferred(db):
+    async def scenario():
+        pool = AuthSessionPool(max_pages_per_session=2)
+        good, bad = pool.register(["good.json", "bad.json"])
+        good.successes = 5
+        bad.failures = 1
+        session = await pool.acquire(["bad.json", "good.json"])
+        assert session is good
+    asyncio.run(scenario())
+
+
+def test_session_block_reports_errors(db):
+    async def scenario():
+        pool = AuthSessionPool(max_pages_per_session=1)
+        with pytest.raises(RuntimeError):
+            async with pool.session(["a.json"]) as lease:
+                assert lease.auth_file == "a.json"
+                raise RuntimeError("page crashed")
+        health = pool.get("a.json")
+        assert health.failures == 1 and health.in_flight == 0
+    asyncio.run(scenario())
+
+
+# Two pools stand in for two scraper processes using the same database.
+
+def test_page_limit_is_shared_between_pools(db):
+    async def scenario():
+        first = AuthSessionPool(max_pages_per_session=1)
+        session = await first.acquire(["a.json"])
+        with pytest.raises(NoHealthySessionError):
+            await AuthSessionPool(max_pages_per_session=1).acquire(
+                ["a.json"], timeout=0.1, wait_while_busy=False)
+        await first.release(session, OUTCOME_OK)
+        assert await AuthSessionPool(max_pages_per_session=1).acquire(["a.json"])
+    asyncio.run(scenario())
+
+
+def test_cooldown_is_shared_between_pools(db):
+    async def scenario():
+        pool = AuthSessionPool(max_pages_per_session=1)
+        session = await pool.acquire(["a.json"])
+        await pool.release(session, OUTCOME_RATE_LIMITED, error="429")
+        assert "a.json" in db.get_auth_session_cooldowns(["a.json"])
+        with pytest.raises(NoHealthySessionError, match="cooling down"):
+            await AuthSessionPool(max_pages_per_session=1).acquire(["a.json"], timeout=0.1)
+    asyncio.run(scenario())
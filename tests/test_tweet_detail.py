@@ -0,0 +1,78 @@
+# tests/test_tweet_detail.py
+from tweet_detail import parse_tweet_detail
+
+FOCAL_ID = "1000"
+
+
+def _tweet(tweet_id, screen_name, new_layout=True, **extra):
+    user = {"core": {"screen_name": screen_name}} if new_layout \
+        else {"legacy": {"screen_name": screen_name}}
+    return {"rest_id": str(tweet_id), "legacy": {"id_str": str(tweet_id)},
+            "core": {"user_results": {"result": user}}, **extra}
+
+
+def _entry(result):
+    return {"content": {"itemContent": {"tweet_results": {"result": result}}}}
+
+
+def _cursor(cursor_type, value):
+    return {"content": {"itemContent": {"cursorType": cursor_type, "value": value}}}
+
+
+def _payload(*entries):
+    return {"data": {"threaded_conversation_with_injections_v2": {"instructions": [
+        {"type": "TimelineAddEntries", "entries": list(entries)}]}}}
+
+
+def test_collects_reply_handles_and_cursors():
+    page = parse_tweet_detail(_payload(
+        _entry(_tweet(FOCAL_ID, "Author")),
+        _entry(_tweet(1001, "Alice")),
+        _entry(_tweet(1002, "BOB", new_layout=False)),
+        _cursor("Bottom", "next-page"),
+        _cursor("ShowMoreThreads", "hidden"),
+    ), FOCAL_ID)
+    assert page.handles == {"@alice", "@bob"}
+    assert page.cursors == {"Bottom": "next-page", "ShowMoreThreads": "hidden"}
+    assert page.newest_reply_id == 1002
+
+
+def test_skips_the_thread_above_the_focal_tweet():
+    page = parse_tweet_detail(_payload(
+        _entry(_tweet(999, "Parent")),
+        _entry(_tweet(FOCAL_ID, "Author")),
+    ), FOCAL_ID)
+    assert page.handles == set()
+    assert page.newest_reply_id == 0
+
+
+def test_ignores_quoted_tweets():
+    quoted = {"result": _tweet(1005, "Quoted")}
+    page = parse_tweet_detail(_payload(
+        _entry(_tweet(1001, "Alice", quoted_status_result=quoted)),
+    ), FOCAL_ID)
+    assert page.handles == {"@alice"}
+
+
+def test_unwraps_visibility_results():
+    hidden_user = _tweet(1001, "Carol")
+    hidden_user["core"]["user_results"]["result"] = {
+        "__typename": "UserWithVisibilityResults",
+        "user": {"core": {"screen_name": "Carol"}}}
+    page = parse_tweet_detail(_payload(
+        _entry({"__typename": "TweetWithVisibilityResults", "tweet": _tweet(1002, "Dave")}),
+        _entry(hidden_user),
+    ), FOCAL_ID)
+    assert page.handles == {"@carol", "@dave"}
+
+
+def test_without_a_focal_id_only_replies_count():
+    reply = _tweet(5, "Erin")
+    reply["legacy"]["in_reply_to_status_id_str"] = "1"
+    page = parse_tweet_detail(_payload(_entry(_tweet(1, "Author")), _entry(reply)))
+    assert page.handles == {"@erin"}
+
+
+def test_empty_page():
+    page = parse_tweet_detail({"data": {}}, FOCAL_ID)
+    assert page.handles == set() and page.cursors == {}
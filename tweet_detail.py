@@ -0,0 +1,140 @@
+# tweet_detail.py
+# Parses the JSON that X's GraphQL TweetDetail endpoint returns for a tweet page.
+import asyncio
+from dataclasses import dataclass, field
+
+TWEET_DETAIL_ENDPOINT = "/TweetDetail"
+
+# Cursors that lead to more replies. "Bottom" pages the main reply list,
+# "ShowMore"/"ShowMoreThreads" expand collapsed branches and hidden replies.
+REPLY_CURSOR_TYPES = ("Bottom", "ShowMore", "ShowMoreThreads",
+                      "ShowMoreThreadsPrompt")
+
+
+@dataclass
+class TweetDetailPage:
+    """The reply data found in one TweetDetail response."""
+    handles: set = field(default_factory=set)
+    cursors: dict = field(default_factory=dict)
+    newest_reply_id: int = 0
+
+
+def _unwrap_tweet(result: dict):
+    """Returns the plain Tweet object from a tweet_results.result value."""
+    if not isinstance(result, dict):
+        return None
+    if result.get("__typename") == "TweetWithVisibilityResults":
+        result = result.get("tweet") or {}
+    return result if result.get("legacy") else None
+
+
+def _screen_name(tweet: dict):
+    """Reads the author's screen name from both the old and new user layouts."""
+    user = ((tweet.get("core") or {}).get("user_results") or {}).get("result") or {}
+    if user.get("__typename") == "UserWithVisibilityResults":
+        user = user.get("user") or {}
+    return ((user.get("core") or {}).get("screen_name")
+            or (user.get("legacy") or {}).get("screen_name"))
+
+
+def _walk(node, tweets: list, cursors: dict):
+    """Collects every tweet result and cursor in the payload, skipping quoted tweets."""
+    if isinstance(node, dict):
+        cursor_type = node.get("cursorType")
+        if cursor_type and node.get("value"):
+            cursors[cursor_type] = node["value"]
+        for key, value in node.items():
+            if key == "quoted_status_result":
+                continue
+            if key == "tweet_results" and isinstance(value, dict):
+                tweet = _unwrap_tweet(value.get("result"))
+                if tweet is not None:
+                    tweets.append(tweet)
+            _walk(value, tweets, cursors)
+    elif isinstance(node, list):
+        for item in node:
+            _walk(item, tweets, cursors)
+
+
+def parse_tweet_detail(payload: dict, focal_tweet_id: str = None) -> TweetDetailPage:
+    """
+    Extracts reply-author handles (as lowercase '@name') and pagination cursors
+    from a TweetDetail payload. Only tweets posted after the focal tweet are
+    counted, which excludes the focal tweet itself and the thread above it.
+    """
+    page = TweetDetailPage()
+    tweets = []
+    _walk(payload, tweets, page.cursors)
+
+    focal_id = int(focal_tweet_id) if focal_tweet_id else 0
+    for tweet in tweets:
+        tweet_id = tweet.get("rest_id") or tweet["legacy"].get("id_str")
+        if not tweet_id or not str(tweet_id).isdigit():
+            continue
+        tweet_id = int(tweet_id)
+        if focal_id and tweet_id <= focal_id:
+            continue
+        if not focal_id and not tweet["legacy"].get("in_reply_to_status_id_str"):
+            continue
+        screen_name = _screen_name(tweet)
+        if screen_name:
+            page.handles.add(f"@{screen_name}".lower())
+            page.newest_reply_id = max(page.newest_reply_id, tweet_id)
+    return page
+
+
+class TweetDetailCollector:
+    """
+    Listens to a page's network responses and parses every TweetDetail payload
+    as it arrives. Call `drain()` before reading the results.
+    """
+
+    def __init__(self, focal_tweet_id: str = None):
+        self.focal_tweet_id = focal_tweet_id
+        self.handles = set()
+        self.cursors = {}
+        self.pages_parsed = 0
+        self.newest_reply_id = 0
+        # Set when X answered a TweetDetail request with HTTP 429.
+        self.rate_limited = False
+        self._pending = set()
+
+    def attach(self, page):
+        page.on("response", self._on_response)
+
+    def _on_response(self, response):
+        if TWEET_DETAIL_ENDPOINT not in response.url:
+            return
+        task = asyncio.ensure_future(self._parse(response))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _parse(self, response):
+        try:
+            if response.status == 429:
+                self.rate_limited = True
+            if not response.ok:
+                print(
+                    f"TweetDetail request failed with HTTP {response.status}.")
+                return
+            self.add_payload(await response.json())
+        except Exception as e:
+            print(f"Could not parse a TweetDetail response: {e}")
+
+    def add_payload(self, payload: dict):
+        """Merges one TweetDetail payload into the collected results."""
+        detail = parse_tweet_detail(payload, self.focal_tweet_id)
+        self.handles.update(detail.handles)
+        self.cursors.update(detail.cursors)
+        self.newest_reply_id = max(
+            self.newest_reply_id, detail.newest_reply_id)
+        self.pages_parsed += 1
+
+    def progress(self) -> int:
+        """A counter that grows whenever parsing turns up something new."""
+        return self.pages_parsed + len(self.handles)
+
+    async def drain(self):
+        """Waits for responses that are still being parsed."""
+        if self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)